@@ -0,0 +1,53 @@
+"""Measure messages/sec of GroqAgent.aprocess_message as the number of concurrent chats grows
+
+Usage: python benchmarks/bench_async_load.py [--llm-latency 0.2] [--zep-latency 0.02] [--messages 4]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAsyncGroq, FakeZepClient, bench_environment
+from groq_agent import GroqAgent
+from memory_manager import MemoryManager
+from tools import ToolRegistry
+
+
+async def run_chats(agent: GroqAgent, chats: int, messages_per_chat: int) -> float:
+    """Run `chats` conversations concurrently, each sending messages in order"""
+    async def chat(user_id: str):
+        for i in range(messages_per_chat):
+            await agent.aprocess_message(user_id, f"message {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(chat(f"user{c}") for c in range(chats)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--zep-latency", type=float, default=0.02)
+    parser.add_argument("--messages", type=int, default=4)
+    parser.add_argument("--chats", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    with bench_environment():
+        agent = GroqAgent(
+            client=FakeAsyncGroq(latency=args.llm_latency),
+            memory_manager=MemoryManager(zep_client=FakeZepClient(latency=args.zep_latency)),
+            tool_registry=ToolRegistry()
+        )
+        print(f"{'chats':>6} {'messages':>9} {'seconds':>9} {'msg/s':>8}")
+        for chats in args.chats:
+            elapsed = asyncio.run(run_chats(agent, chats, args.messages))
+            total = chats * args.messages
+            print(f"{chats:>6} {total:>9} {elapsed:>9.2f} {total / elapsed:>8.1f}")
+        print(f"memory cache: {agent.memory_manager.get_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare per-user memory operations with the batch APIs against a fake Zep
+
+For --users users, times reading, writing and clearing memories one user
+at a time against get_memories_many, update_memories_many and
+clear_memories_many, and a JSONL export and import of all of them.
+
+Usage: python benchmarks/bench_memory_batch.py [--users 200] [--zep-latency 0.02] [--concurrency 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeZepClient, bench_environment
+from memory_manager import MemoryManager
+
+
+def timed(label: str, zep: FakeZepClient, fn):
+    calls = zep.document.calls
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:>9.2f} {zep.document.calls - calls:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--zep-latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with bench_environment() as workdir:
+        os.environ["MEMORY_BATCH_CONCURRENCY"] = str(args.concurrency)
+        zep = FakeZepClient(latency=args.zep_latency)
+        manager = MemoryManager(zep_client=zep)
+        users = [f"user{i}" for i in range(args.users)]
+        updates = {user_id: {"language": "pt-BR", "note": f"imported note for {user_id}"} for user_id in users}
+
+        print(f"{'':<32} {'seconds':>9} {'zep calls':>10}")
+        timed("store one user at a time", zep, lambda: [manager.store_memory(u, updates[u]) for u in users])
+        manager.cache.clear()
+        timed("get one user at a time", zep, lambda: [manager.get_memories(u) for u in users])
+        manager.cache.clear()
+        timed("update_memories_many", zep, lambda: manager.update_memories_many(updates))
+        manager.cache.clear()
+        timed("get_memories_many", zep, lambda: manager.get_memories_many(users))
+
+        path = os.path.join(workdir, "memories.jsonl")
+        timed("export_jsonl", zep, lambda: manager.export_jsonl(path))
+        timed("clear one user at a time", zep, lambda: [manager.clear_memories(u) for u in users])
+        manager.cache.clear()
+        timed("import_jsonl", zep, lambda: manager.import_jsonl(path))
+        timed("clear_memories_many", zep, lambda: manager.clear_memories_many(users))
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare the memory section of the system prompt with and without relevance selection
+
+For users with more and more memories, reports the estimated tokens of
+listing every memory against the selected ones, and the time selection
+takes per message once the user's relevance index is built.
+
+Usage: python benchmarks/bench_memory_prompt.py [--memories 10 100 1000 5000] [--top-k 20] [--budget 600]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_history import estimate_tokens
+from memory_ranking import MemoryIndex, memory_line, select_memories
+
+TOPICS = ["music", "travel", "cooking", "python", "football", "movies", "dogs", "coffee", "work", "health"]
+
+
+def make_memories(count: int, generator: random.Random):
+    now = time.time()
+    memories = {"language": "pt-BR"}
+    updated_at = {"language": now - 365 * 86400}
+    for i in range(count):
+        topic = generator.choice(TOPICS)
+        memories[f"{topic}_{i}"] = f"User mentioned {topic} detail number {i}: " + " ".join([topic] * generator.randint(1, 8))
+        updated_at[f"{topic}_{i}"] = now - generator.uniform(0, 180) * 86400
+    return memories, updated_at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--memories", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--budget", type=int, default=600)
+    args = parser.parse_args()
+    generator = random.Random(0)
+
+    print(f"{'memories':>9} {'all tokens':>11} {'selected':>9} {'tokens':>7} {'select ms':>10}")
+    for count in args.memories:
+        memories, updated_at = make_memories(count, generator)
+        queries = [f"any tips about {generator.choice(TOPICS)}?" for _ in range(20)]
+        index = MemoryIndex()
+        index.sync(memories)
+        start = time.perf_counter()
+        for query in queries:
+            selected = select_memories(
+                memories, updated_at, query, args.top_k, args.budget, pinned=["language"], index=index
+            )
+        elapsed = (time.perf_counter() - start) / len(queries)
+        all_tokens = estimate_tokens("".join(memory_line(key, value) for key, value in memories.items()))
+        selected_tokens = estimate_tokens("".join(memory_line(key, value) for key, value in selected.items()))
+        print(f"{count:>9} {all_tokens:>11} {len(selected):>9} {selected_tokens:>7} {elapsed * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
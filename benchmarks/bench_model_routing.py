@@ -0,0 +1,94 @@
+"""Compare latency and cost of answering a chat mix with and without model routing
+
+Sends --messages messages, --tool-share of them asking for a web search,
+through GroqAgent against a fake Groq where the small model answers in
+--small-latency and the large one in --large-latency seconds. Then sends
+messages to a model that keeps repeating the same tool call, and reports
+how many completions each took before the agent stopped it.
+
+Usage: python benchmarks/bench_model_routing.py [--messages 200] [--tool-share 0.3] [--small-latency 0.05] [--large-latency 0.2]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAsyncGroq, FakeZepClient, bench_environment
+from groq_agent import GroqAgent
+from memory_manager import MemoryManager
+from metrics import metrics
+from tools import ToolRegistry
+
+SMALL_TALK = ["oi, tudo bem?", "good morning!", "thanks a lot", "qual o seu nome?", "nice, see you later", "haha ok"]
+SEARCHES = ["search the web for python news", "search flights to Lisbon", "search recipes with eggs"]
+
+
+def make_agent(args, **kwargs) -> GroqAgent:
+    small_model = os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant")
+    return GroqAgent(
+        client=FakeAsyncGroq(
+            latency=args.large_latency,
+            tool_calls_per_turn=1,
+            model_latency={small_model: args.small_latency},
+            tool_keyword="search",
+            **kwargs
+        ),
+        memory_manager=MemoryManager(zep_client=FakeZepClient(latency=0)),
+        tool_registry=ToolRegistry()
+    )
+
+
+def run(agent: GroqAgent, messages):
+    """Answer messages one at a time and get each one's latency"""
+    latencies = []
+    for i, message in enumerate(messages):
+        start = time.perf_counter()
+        agent.process_message(f"user{i % 20}", message)
+        latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+def cost():
+    return sum(value for name, value in metrics.snapshot()["counters"].items()
+               if name.startswith("groq_cost_dollars_total"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--tool-share", type=float, default=0.3)
+    parser.add_argument("--small-latency", type=float, default=0.05)
+    parser.add_argument("--large-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    generator = random.Random(0)
+    messages = [
+        generator.choice(SEARCHES if generator.random() < args.tool_share else SMALL_TALK)
+        for _ in range(args.messages)
+    ]
+
+    print(f"{'routing':>8} {'seconds':>8} {'p50 ms':>8} {'p95 ms':>8} {'small calls':>12} {'large calls':>12} {'cost $':>9}")
+    for routing in ("false", "true"):
+        with bench_environment():
+            os.environ["MODEL_ROUTING"] = routing
+            metrics.reset()
+            agent = make_agent(args)
+            latencies = run(agent, messages)
+            calls = agent.client.completions.calls_by_model
+            small = sum(count for model, count in calls.items() if model != agent.router.large_model)
+            print(f"{routing:>8} {sum(latencies):>8.2f} {latencies[len(latencies) // 2] * 1000:>8.1f} "
+                  f"{latencies[int(len(latencies) * 0.95)] * 1000:>8.1f} {small:>12} "
+                  f"{calls.get(agent.router.large_model, 0):>12} {cost():>9.5f}")
+
+    with bench_environment():
+        metrics.reset()
+        agent = make_agent(args, repeat_tool_calls=True)
+        latencies = run(agent, SEARCHES)
+        print(f"\nstuck model: {agent.client.completions.calls / len(SEARCHES):.1f} completions per message "
+              f"(at most {agent.max_iterations + 1} without repeat detection), "
+              f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
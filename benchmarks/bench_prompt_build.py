@@ -0,0 +1,71 @@
+"""Measure system prompt build time with a large tool registry, cold versus cached
+
+Usage: python benchmarks/bench_prompt_build.py [--tools 500] [--iterations 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAsyncGroq, FakeZepClient, bench_environment
+from groq_agent import GroqAgent
+from memory_manager import MemoryManager
+from tools import Tool, ToolRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    with bench_environment():
+        registry = ToolRegistry()
+        registry.register_tools([
+            Tool(
+                name=f"tool_{i}",
+                description=f"Generated tool number {i}",
+                parameters={
+                    "type": "object",
+                    "properties": {"query": {"type": "string", "description": "Input"}},
+                    "required": ["query"]
+                }
+            )
+            for i in range(args.tools)
+        ])
+        agent = GroqAgent(
+            client=FakeAsyncGroq(),
+            memory_manager=MemoryManager(zep_client=FakeZepClient(latency=0)),
+            tool_registry=registry
+        )
+        memories = {"language": "pt-BR", "preferences": "Prefers concise responses"}
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            # Bumping the version forces a full rebuild, as before caching
+            registry.version += 1
+            agent._build_system_prompt("user", memories)
+        cold = (time.perf_counter() - start) / args.iterations
+
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            agent._build_system_prompt("user", memories)
+        warm = (time.perf_counter() - start) / args.iterations
+
+        start = time.perf_counter()
+        for i in range(args.iterations):
+            # A new message selects its own top-k tools from the index
+            tool_names = registry.select_tools(f"run generated tool number {i % args.tools}", agent.tool_top_k)
+            prompt = agent._build_system_prompt("user", memories, tool_names)
+        selected = (time.perf_counter() - start) / args.iterations
+
+        print(f"tools: {len(registry.tools)}")
+        print(f"rebuild:  {cold * 1000:.3f} ms")
+        print(f"cached:   {warm * 1000:.3f} ms")
+        print(f"top-{agent.tool_top_k}:    {selected * 1000:.3f} ms ({len(tool_names)} tools, {len(prompt)} chars)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Measure ToolRegistry load time as the number of tools in tools_config.json grows
+
+Usage: python benchmarks/bench_registry_startup.py [--tools 10 100 500 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import bench_environment
+from tools import ToolRegistry
+
+
+def write_tools_config(count: int):
+    """Write a tools_config.json holding `count` generated tools"""
+    tools_data = [
+        {
+            "name": f"tool_{i}",
+            "description": f"Generated tool number {i}",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Input"},
+                    "api_key": {"type": "env_var", "description": "Key", "env_var_name": "GOOGLE_API_KEY"}
+                },
+                "required": ["query"]
+            }
+        }
+        for i in range(count)
+    ]
+    with open("tools_config.json", "w") as f:
+        json.dump(tools_data, f)
+    for path in ("tools_config.journal", "tools_config.history"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tools", type=int, nargs="+", default=[10, 100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with bench_environment():
+        print(f"{'tools':>6} {'load ms':>9}")
+        for count in args.tools:
+            elapsed = 0.0
+            for _ in range(args.repeat):
+                write_tools_config(count)
+                start = time.perf_counter()
+                registry = ToolRegistry()
+                elapsed += time.perf_counter() - start
+            print(f"{len(registry.tools):>6} {elapsed / args.repeat * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
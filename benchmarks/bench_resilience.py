@@ -0,0 +1,107 @@
+"""Measure memory read latency while a stand-in Zep server degrades, with and without the circuit breaker
+
+Each run goes through healthy, flaky (503/429), hanging, down and recovered
+phases against benchmarks/fault_server.py. Reads that can't reach Zep are
+served from the expired cache entry, so "served" should stay at 100%.
+
+Usage: python benchmarks/bench_resilience.py [--users 20] [--reads 20] [--timeout 0.2]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import bench_environment
+from benchmarks.fault_server import FaultServer, HttpZepClient
+from memory_manager import MemoryManager
+from metrics import metrics
+from transport import CircuitBreaker, ServiceGuard
+
+PHASES = ("healthy", "flaky", "hang", "down", "recovered")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def run_phase(manager: MemoryManager, server: FaultServer, users: int, reads: int) -> Dict[str, float]:
+    """Read memories for `reads` users in turn and summarize latency and outcomes"""
+    stale_before = metrics.snapshot()["counters"].get("memory_stale_reads_total", 0)
+    requests_before = server.requests
+    latencies = []
+    served = 0
+    # Silence the per-read error prints while Zep is failing
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(reads):
+            user_id = f"user{i % users}"
+            start = time.perf_counter()
+            memories = manager.get_memories(user_id)
+            latencies.append(time.perf_counter() - start)
+            served += memories.get("name") == user_id
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "max": max(latencies),
+        "served": served / reads,
+        "stale": metrics.snapshot()["counters"].get("memory_stale_reads_total", 0) - stale_before,
+        "requests": server.requests - requests_before
+    }
+
+
+def run(args, use_breaker: bool):
+    server = FaultServer(hang_seconds=args.timeout * 10)
+    server.start()
+    try:
+        manager = MemoryManager(zep_client=HttpZepClient(server.url, timeout=args.timeout))
+        threshold = int(os.environ["BREAKER_FAILURE_THRESHOLD"]) if use_breaker else 10 ** 9
+        manager.zep = ServiceGuard("zep", deadline=manager.zep.deadline, breaker=CircuitBreaker("zep", failure_threshold=threshold))
+        for u in range(args.users):
+            manager.store_memory(f"user{u}", {"name": f"user{u}"})
+
+        print(f"\ncircuit breaker: {'on' if use_breaker else 'off'}")
+        print(f"{'phase':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'served':>7} {'stale':>6} {'zep reqs':>9} {'breaker':>10}")
+        for phase in PHASES:
+            server.mode = "healthy" if phase == "recovered" else phase
+            if phase == "recovered":
+                # Let the breaker reach half-open so the first read is its trial call
+                time.sleep(manager.zep.breaker.reset_timeout)
+            # Expire every cached entry so each read has to go to Zep
+            time.sleep(manager.cache.ttl)
+            result = run_phase(manager, server, args.users, args.reads)
+            print(
+                f"{phase:>10} {result['p50'] * 1000:>8.1f} {result['p95'] * 1000:>8.1f} {result['max'] * 1000:>8.1f} "
+                f"{result['served']:>7.0%} {result['stale']:>6.0f} {result['requests']:>9} {manager.zep.breaker.state:>10}"
+            )
+        manager.close()
+    finally:
+        server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--reads", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=0.2, help="per-request timeout of the Zep client")
+    args = parser.parse_args()
+
+    with bench_environment():
+        os.environ.update({
+            "MEMORY_CACHE_TTL": "0.05",
+            "ZEP_DEADLINE": str(args.timeout * 5),
+            "RETRY_BASE_DELAY": "0.05",
+            "RETRY_MAX_DELAY": "0.5",
+            "BREAKER_FAILURE_THRESHOLD": "5",
+            "BREAKER_RESET_TIMEOUT": "1"
+        })
+        run(args, use_breaker=False)
+        run(args, use_breaker=True)
+
+
+if __name__ == "__main__":
+    main()
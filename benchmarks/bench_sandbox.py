@@ -0,0 +1,89 @@
+"""Compare cold and warm call latency of agent-written tool code in the sandbox
+
+cold: a new worker interpreter is started for every call
+first call: the first call on a freshly started pool, which waits for interpreter startup
+warm: calls on workers that are already running, with the tool code already compiled
+
+Usage: python benchmarks/bench_sandbox.py [--calls 50] [--workers 2]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sandbox import WORKER_PATH, SandboxPool
+
+TOOL_CODE = "def run(n):\n    return sum(i * i for i in range(n))\n"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def report(label: str, latencies: List[float]):
+    print(f"{label:>12} {percentile(latencies, 0.5) * 1000:>9.2f} {percentile(latencies, 0.95) * 1000:>9.2f} "
+          f"{max(latencies) * 1000:>9.2f}")
+
+
+def cold_call(pool: SandboxPool) -> float:
+    """Start an interpreter, run one call and exit, as a design without reuse would"""
+    request = json.dumps({"code": TOOL_CODE, "arguments": {"n": 1000}}) + "\n"
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-I", WORKER_PATH, str(pool.cpu_seconds), str(pool.memory_mb), "1"],
+        input=request.encode(),
+        stdout=subprocess.PIPE,
+        check=True
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{'':>12} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    reference = SandboxPool(size=args.workers)
+    report("cold", [cold_call(reference) for _ in range(args.calls)])
+
+    first_calls = []
+    for _ in range(min(args.calls, 10)):
+        pool = SandboxPool(size=args.workers)
+        start = time.perf_counter()
+        pool.run(TOOL_CODE, {"n": 1000})
+        first_calls.append(time.perf_counter() - start)
+        pool.close()
+    report("first call", first_calls)
+
+    pool = SandboxPool(size=args.workers)
+    pool.run(TOOL_CODE, {"n": 1000})
+    warm = []
+    for _ in range(args.calls):
+        start = time.perf_counter()
+        pool.run(TOOL_CODE, {"n": 1000})
+        warm.append(time.perf_counter() - start)
+    report("warm", warm)
+
+    recycled = []
+    for _ in range(min(args.calls, 10)):
+        start = time.perf_counter()
+        try:
+            pool.run("import os\ndef run():\n    os._exit(1)\n", {})
+        except Exception:
+            pass
+        pool.run(TOOL_CODE, {"n": 1000})
+        recycled.append(time.perf_counter() - start)
+    report("after crash", recycled)
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measure how long the bot takes to start, with and without LAZY_INIT
+
+Each run is a fresh interpreter that imports telegram_bot and builds a
+TelegramBot, talking to a fake Zep that answers every call after
+--zep-latency seconds. "construct" is when the bot can start taking
+updates, "collection ready" is when the Zep collection check finished.
+
+Usage: python benchmarks/bench_startup.py [--zep-latency 0.5] [--runs 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child(zep_latency: float):
+    """Start the bot once and print the phase timings as JSON"""
+    start = time.perf_counter()
+    from benchmarks.fakes import FakeZepClient, bench_environment
+    import telegram_bot
+    imported = time.perf_counter()
+
+    with bench_environment():
+        os.environ["TELEGRAM_BOT_TOKEN"] = "123:fake"
+        os.environ.setdefault("GROQ_API_KEY", "bench")
+        from groq_agent import GroqAgent
+        from memory_manager import MemoryManager
+        built = time.perf_counter()
+        agent = GroqAgent(memory_manager=MemoryManager(zep_client=FakeZepClient(latency=zep_latency)))
+        telegram_bot.TelegramBot(agent=agent)
+        constructed = time.perf_counter()
+        while not agent.memory_manager._collection_ready:
+            time.sleep(0.001)
+        ready = time.perf_counter()
+    print(json.dumps({
+        "import": imported - start,
+        "construct": constructed - built,
+        "collection ready": ready - built
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zep-latency", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.zep_latency)
+        return
+
+    print(f"{'LAZY_INIT':>10} {'import ms':>10} {'construct ms':>13} {'collection ready ms':>20}")
+    for lazy in ("false", "true"):
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", "--zep-latency", str(args.zep_latency)],
+                env={**os.environ, "LAZY_INIT": lazy},
+                stdout=subprocess.PIPE,
+                check=True
+            ).stdout
+            runs.append(json.loads(output.decode().strip().splitlines()[-1]))
+        median = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+        print(f"{lazy:>10} {median['import'] * 1000:>10.1f} {median['construct'] * 1000:>13.1f} "
+              f"{median['collection ready'] * 1000:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
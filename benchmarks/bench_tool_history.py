@@ -0,0 +1,100 @@
+"""Measure the tool version log after many edits
+
+Compares the log's size with storing a full copy of the definition per
+version, and times reading the latest version, rebuilding an old one,
+and reloading the log at startup.
+
+Usage: python benchmarks/bench_tool_history.py [--edits 5000] [--checkpoint-every 50]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_history import ToolHistory
+
+BASE_CODE = "".join(f"def helper_{i}(x):\n    return x + {i}\n\n" for i in range(40)) + "def run(n):\n    return helper_0(n)\n"
+
+
+def edited(definition: dict, step: int) -> dict:
+    """Change one thing, the way an agent editing its own tool would"""
+    definition = json.loads(json.dumps(definition))
+    choice = step % 3
+    if choice == 0:
+        definition["description"] = f"Generated tool, revision {step}"
+    elif choice == 1:
+        lines = definition["code"].splitlines(keepends=True)
+        line = random.randrange(len(lines))
+        lines[line] = f"    return x + {step}\n" if lines[line].startswith("    return") else lines[line]
+        definition["code"] = "".join(lines)
+    else:
+        definition["parameters"]["properties"]["n"]["description"] = f"Input, revision {step}"
+    definition["last_modified"] = f"2024-01-01T00:00:{step % 60:02d}"
+    return definition
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edits", type=int, default=5000)
+    parser.add_argument("--checkpoint-every", type=int, default=50)
+    args = parser.parse_args()
+    os.environ["TOOL_HISTORY_CHECKPOINT_EVERY"] = str(args.checkpoint_every)
+    random.seed(0)
+
+    definition = {
+        "name": "generated",
+        "description": "Generated tool",
+        "parameters": {"type": "object", "properties": {"n": {"type": "integer", "description": "Input"}}},
+        "created_at": "2024-01-01T00:00:00",
+        "last_modified": "2024-01-01T00:00:00",
+        "cache_ttl": None,
+        "cost_class": "io",
+        "code": BASE_CODE
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        history = ToolHistory(os.path.join(workdir, "tools_config.history"))
+        full_copies = 0
+        start = time.perf_counter()
+        with history.batch():
+            history.record("generated", "create", definition)
+            full_copies += len(json.dumps(definition)) + 1
+            for step in range(1, args.edits):
+                definition = edited(definition, step)
+                history.record("generated", "edit", definition)
+                full_copies += len(json.dumps(definition)) + 1
+        record_time = time.perf_counter() - start
+        log_size = os.path.getsize(history.path)
+
+        latest = history.get_latest_version("generated")
+        start = time.perf_counter()
+        for _ in range(1000):
+            history.get_latest_version("generated")
+        latest_time = (time.perf_counter() - start) / 1000
+
+        versions = random.sample(range(1, latest + 1), min(200, latest))
+        start = time.perf_counter()
+        for version in versions:
+            history.get_version("generated", version)
+        rebuild_time = (time.perf_counter() - start) / len(versions)
+        assert history.get_version("generated", latest) == definition
+
+        start = time.perf_counter()
+        ToolHistory(history.path).load()
+        load_time = time.perf_counter() - start
+
+    print(f"versions:                {latest}")
+    print(f"log size:                {log_size / 1024:.1f} KiB")
+    print(f"full copy per version:   {full_copies / 1024:.1f} KiB ({full_copies / log_size:.1f}x larger)")
+    print(f"record:                  {record_time / args.edits * 1e6:.1f} us per version")
+    print(f"latest version lookup:   {latest_time * 1e6:.2f} us")
+    print(f"rebuild a past version:  {rebuild_time * 1000:.3f} ms")
+    print(f"load log at startup:     {load_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Load-test webhook mode against a local fake Telegram Bot API
+
+Starts a fake Bot API server, runs TelegramBot in webhook mode against it
+with the Groq/Zep fakes, posts updates for many chats and reports
+throughput and whether every chat got its replies in order.
+
+Usage: python benchmarks/fake_telegram.py [--chats 50] [--messages 5] [--lanes 16]
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+from urllib.parse import parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAsyncGroq, FakeZepClient, bench_environment
+from webhook_server import read_http_request, write_http_response
+
+
+class FakeBotApi:
+    """Answers the Bot API methods the bot calls and records every message it sends"""
+
+    def __init__(self):
+        # Message ids sent to each chat and the latest text of every message, edits included
+        self.sent: Dict[int, List[int]] = defaultdict(list)
+        self.texts: Dict[int, str] = {}
+        self.calls = Counter()
+        self.port = None
+        self._message_id = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_http_request(reader)
+                if request is None:
+                    break
+                _, path, headers, body = request
+                method = path.rsplit("/", 1)[-1]
+                result = self._call(method, self._parse_params(headers, body))
+                await write_http_response(writer, 200, json.dumps({"ok": True, "result": result}).encode())
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_params(headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+        if not body:
+            return {}
+        if headers.get("content-type", "").startswith("application/json"):
+            return json.loads(body)
+        return {key: values[0] for key, values in parse_qs(body.decode()).items()}
+
+    def _call(self, method: str, params: Dict[str, Any]) -> Any:
+        self.calls[method] += 1
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params["chat_id"])
+            if method == "sendMessage":
+                self._message_id += 1
+                message_id = self._message_id
+                self.sent[chat_id].append(message_id)
+            else:
+                message_id = int(params["message_id"])
+            self.texts[message_id] = params["text"]
+            return {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params["text"]
+            }
+        if method == "deleteMessage":
+            message_id = int(params["message_id"])
+            self.sent[int(params["chat_id"])].remove(message_id)
+            del self.texts[message_id]
+        return True
+
+    def chat_text(self, chat_id: int) -> str:
+        """Get everything currently shown in a chat, oldest message first"""
+        return " ".join(self.texts[message_id] for message_id in self.sent.get(chat_id, []))
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+            "text": text
+        }
+    }
+
+
+async def post_updates(port: int, path: str, updates: List[Dict[str, Any]]):
+    """POST updates one after another over a single keep-alive connection"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for update in updates:
+        body = json.dumps(update).encode()
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        await read_http_response_status(reader)
+    writer.close()
+
+
+async def read_http_response_status(reader) -> int:
+    status_line = await reader.readline()
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_load_test(args) -> None:
+    api = FakeBotApi()
+    await api.start()
+    webhook_port = free_port()
+    os.environ.update({
+        "TELEGRAM_BOT_TOKEN": "123:fake",
+        "TELEGRAM_API_BASE_URL": f"http://127.0.0.1:{api.port}/bot",
+        "BOT_MODE": "webhook",
+        "WEBHOOK_LISTEN": "127.0.0.1",
+        "WEBHOOK_PORT": str(webhook_port),
+        "WEBHOOK_LANES": str(args.lanes),
+        "STREAM_RESPONSES": "true" if args.stream else "false"
+    })
+
+    from groq_agent import GroqAgent
+    from memory_manager import MemoryManager
+    from telegram_bot import TelegramBot
+    from tools import ToolRegistry
+
+    agent = GroqAgent(
+        client=FakeAsyncGroq(latency=args.llm_latency),
+        memory_manager=MemoryManager(zep_client=FakeZepClient(latency=args.zep_latency)),
+        tool_registry=ToolRegistry()
+    )
+    bot = TelegramBot(agent=agent)
+    stop_event = asyncio.Event()
+    serving = asyncio.create_task(bot.run_webhook(bot.build_application(), stop_event))
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", webhook_port)
+            writer.close()
+            break
+        except OSError:
+            await asyncio.sleep(0.05)
+
+    expected = args.chats * args.messages
+    start = time.perf_counter()
+    update_id = 0
+    per_chat = []
+    for chat in range(args.chats):
+        updates = []
+        for i in range(args.messages):
+            update_id += 1
+            updates.append(make_update(update_id, 1000 + chat, f"chat {chat} message {i}"))
+        per_chat.append(updates)
+    await asyncio.gather(*(post_updates(webhook_port, bot.webhook_path, updates) for updates in per_chat))
+    accepted = time.perf_counter() - start
+
+    # Messages sent while a chat is busy are answered together, so wait for the last one of each chat
+    last_message = f"message {args.messages - 1} "
+    while not all(last_message in api.chat_text(1000 + chat) + " " for chat in range(args.chats)):
+        if time.perf_counter() - start > args.timeout:
+            break
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    answered = [
+        [int(n) for n in re.findall(r"message (\d+)", api.chat_text(1000 + chat))]
+        for chat in range(args.chats)
+    ]
+    in_order = all(indices == list(range(args.messages)) for indices in answered)
+    stop_event.set()
+    await serving
+    await api.stop()
+
+    replies = sum(len(message_ids) for message_ids in api.sent.values())
+    handled = sum(len(indices) for indices in answered)
+    print(f"chats: {args.chats}  messages: {expected}  lanes: {args.lanes}")
+    print(f"accepted in {accepted:.2f}s, answered {handled}/{expected} in {elapsed:.2f}s ({handled / elapsed:.1f} msg/s)")
+    print(f"replies sent: {replies} (messages that arrived together are answered in one reply)")
+    print(f"every message answered once, in order: {in_order}")
+    print(f"bot api calls: {dict(api.calls)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=5)
+    parser.add_argument("--lanes", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--zep-latency", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    with bench_environment():
+        asyncio.run(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
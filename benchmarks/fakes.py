@@ -0,0 +1,211 @@
+"""In-process stand-ins for Groq, Zep and Telegram used by the benchmarks"""
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+
+def fake_tool_call(name: str, arguments: Dict[str, Any]) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=f"call_{uuid.uuid4().hex[:8]}",
+        type="function",
+        function=SimpleNamespace(name=name, arguments=json.dumps(arguments))
+    )
+
+
+class FakeCompletions:
+    """Answers with an echo of the last message, after asking for tools on a share of first turns
+
+    Latency varies by up to `jitter` (a fraction of latency) either way,
+    and tools are requested on `tool_call_probability` of messages, both
+    drawn from a seeded generator so runs are repeatable. `model_latency`
+    overrides latency for the models it lists. With `tool_keyword` tools
+    are only requested for messages containing it, and with
+    `repeat_tool_calls` the same lookups are requested again on every turn,
+    like a model stuck in a loop, until tool_choice is "none".
+    """
+
+    def __init__(self, latency: float, tool_calls_per_turn: int = 0, jitter: float = 0.0,
+                 tool_call_probability: float = 1.0, seed: int = 0, model_latency: Dict[str, float] = None,
+                 tool_keyword: str = None, repeat_tool_calls: bool = False):
+        self.latency = latency
+        self.tool_calls_per_turn = tool_calls_per_turn
+        self.jitter = jitter
+        self.tool_call_probability = tool_call_probability
+        self.model_latency = model_latency or {}
+        self.tool_keyword = tool_keyword
+        self.repeat_tool_calls = repeat_tool_calls
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.calls_by_model: Dict[str, int] = {}
+
+    async def create(self, messages: List[Dict[str, Any]], model: str, tools=None, stream: bool = False, **kwargs):
+        self.calls += 1
+        self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+        latency = self.model_latency.get(model, self.latency)
+        await asyncio.sleep(latency * (1 + self.jitter * (2 * self.random.random() - 1)))
+        if (self.tool_calls_per_turn and kwargs.get("tool_choice") != "none"
+                and ((messages[-1]["role"] == "user" and self.random.random() < self.tool_call_probability
+                      and (self.tool_keyword is None or self.tool_keyword in messages[-1]["content"]))
+                     or (self.repeat_tool_calls and messages[-1]["role"] == "tool"))):
+            # First turn of a message asks for several lookups at once
+            question = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+            tool_calls = [
+                fake_tool_call("search_web", {"query": f"{question} #{i}"})
+                for i in range(self.tool_calls_per_turn)
+            ]
+            message = SimpleNamespace(content=None, tool_calls=tool_calls)
+        else:
+            message = SimpleNamespace(content=f"echo: {messages[-1]['content']}", tool_calls=None)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(str(m.get("content") or "")) for m in messages) // 4,
+            completion_tokens=len(message.content or "") // 4 + 10 * len(message.tool_calls or [])
+        )
+        if stream:
+            return self._stream(message, usage)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    async def _stream(self, message: SimpleNamespace, usage: SimpleNamespace):
+        """Yield the message as streaming chunks, one word or tool call at a time, then the usage"""
+        def chunk(content=None, tool_calls=None):
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content, tool_calls=tool_calls))])
+
+        for index, tool_call in enumerate(message.tool_calls or []):
+            yield chunk(tool_calls=[SimpleNamespace(index=index, id=tool_call.id, function=tool_call.function)])
+        for word in (message.content or "").split(" "):
+            await asyncio.sleep(0)
+            yield chunk(content=word + " ")
+        yield SimpleNamespace(choices=[], x_groq=SimpleNamespace(usage=usage))
+
+
+class FakeAsyncGroq:
+    """Mimics AsyncGroq.chat.completions.create with a fixed latency"""
+
+    def __init__(self, latency: float = 0.2, tool_calls_per_turn: int = 0, **kwargs):
+        self.completions = FakeCompletions(latency, tool_calls_per_turn, **kwargs)
+        self.chat = SimpleNamespace(completions=self.completions)
+
+
+class FakeDocumentClient:
+    """Mimics the subset of the Zep document API used by MemoryManager"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.documents: List[SimpleNamespace] = []
+
+    def _round_trip(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def get_collection(self, name: str):
+        self._round_trip()
+        return SimpleNamespace(name=name)
+
+    def add_collection(self, name: str, description: str = None, metadata: Dict[str, Any] = None):
+        self._round_trip()
+        return SimpleNamespace(name=name)
+
+    def add(self, collection_name: str, documents: List[Dict[str, Any]]):
+        self._round_trip()
+        for document in documents:
+            self.documents.append(SimpleNamespace(
+                uuid=str(uuid.uuid4()),
+                content=document["content"],
+                metadata=dict(document["metadata"])
+            ))
+
+    def _matches(self, document: SimpleNamespace, metadata: Dict[str, Any]) -> bool:
+        return all(document.metadata.get(key) == value for key, value in metadata.items())
+
+    def search(self, collection_name: str, search_params: Dict[str, Any]):
+        self._round_trip()
+        metadata = search_params.get("metadata", {})
+        return [document for document in self.documents if self._matches(document, metadata)]
+
+    def delete(self, collection_name: str, metadata: Dict[str, Any]):
+        self._round_trip()
+        self.documents = [document for document in self.documents if not self._matches(document, metadata)]
+
+
+class FakeZepClient:
+    """Mimics ZepClient with a fixed per-call latency"""
+
+    def __init__(self, latency: float = 0.02):
+        self.document = FakeDocumentClient(latency)
+
+
+class FakeTelegramApi:
+    """Counts the Bot API calls made through FakeTelegramMessage, each taking `latency` seconds"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+
+    async def call(self, method: str):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        await asyncio.sleep(self.latency)
+
+
+class FakeTelegramMessage:
+    """Mimics the parts of telegram.Message the bot's handlers use"""
+
+    def __init__(self, api: FakeTelegramApi, chat_id: int, text: str = ""):
+        self.api = api
+        self.text = text
+        self.chat = SimpleNamespace(id=chat_id, send_action=self._send_action)
+        self.replies: List["FakeTelegramMessage"] = []
+        self.deleted = False
+
+    async def _send_action(self, action: str):
+        await self.api.call("sendChatAction")
+
+    async def reply_text(self, text: str, **kwargs) -> "FakeTelegramMessage":
+        await self.api.call("sendMessage")
+        reply = FakeTelegramMessage(self.api, self.chat.id, text)
+        self.replies.append(reply)
+        return reply
+
+    async def edit_text(self, text: str, **kwargs) -> "FakeTelegramMessage":
+        await self.api.call("editMessageText")
+        self.text = text
+        return self
+
+    async def delete(self) -> bool:
+        await self.api.call("deleteMessage")
+        self.deleted = True
+        return True
+
+
+def fake_update(api: FakeTelegramApi, user_id: int, text: str) -> SimpleNamespace:
+    """Build an object with the attributes of a telegram.Update for a private text message"""
+    return SimpleNamespace(
+        effective_user=SimpleNamespace(id=user_id),
+        message=FakeTelegramMessage(api, user_id, text)
+    )
+
+
+@contextmanager
+def bench_environment():
+    """Run inside a temporary working directory with the tool env files the registry expects"""
+    previous_cwd = os.getcwd()
+    previous_env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        with open("tool_keys.env", "w") as f:
+            f.write("GOOGLE_API_KEY=BENCH_GOOGLE_API_KEY\n")
+            f.write("WEATHER_API_KEY=BENCH_WEATHER_API_KEY\n")
+        os.environ["BENCH_GOOGLE_API_KEY"] = "bench"
+        os.environ["BENCH_WEATHER_API_KEY"] = "bench"
+        try:
+            yield workdir
+        finally:
+            os.chdir(previous_cwd)
+            os.environ.clear()
+            os.environ.update(previous_env)
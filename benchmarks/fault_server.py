@@ -0,0 +1,171 @@
+"""Local stand-in for the Zep document API that injects latency, errors and hangs
+
+The server keeps documents in a FakeDocumentClient and exposes each of its
+methods as POST /document/<method> with the keyword arguments as a JSON body.
+HttpZepClient speaks that protocol over real sockets, so MemoryManager sees
+genuine timeouts, refused connections and 429/5xx responses.
+"""
+import json
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict
+
+from benchmarks.fakes import FakeDocumentClient
+
+DOCUMENT_METHODS = ("get_collection", "add_collection", "add", "search", "delete")
+
+
+class FaultServer:
+    """Threaded HTTP server whose failure mode can be changed while it runs
+
+    mode is one of "healthy", "flaky" (error_rate of the requests fail with
+    a 503 or a 429 with Retry-After), "down" (every request gets a 503) and
+    "hang" (requests stall for hang_seconds before answering).
+    """
+
+    def __init__(self, latency: float = 0.005, error_rate: float = 0.3, hang_seconds: float = 5.0):
+        self.mode = "healthy"
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_seconds = hang_seconds
+        self.requests = 0
+        self.failures = 0
+        self.documents = FakeDocumentClient(latency=0)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fault-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _fault(self):
+        """Pick the injected failure for one request: None, or (status, headers)"""
+        if self.mode == "down":
+            return 503, {}
+        if self.mode == "flaky" and random.random() < self.error_rate:
+            return random.choice([(503, {}), (429, {"Retry-After": "0.05"})])
+        return None
+
+    def _handle(self, method: str, body: bytes):
+        with self._lock:
+            self.requests += 1
+        if self.mode == "hang":
+            time.sleep(self.hang_seconds)
+        else:
+            time.sleep(self.latency)
+        fault = self._fault()
+        if fault is not None:
+            with self._lock:
+                self.failures += 1
+            return fault[0], fault[1], {"message": "injected failure"}
+        if method not in DOCUMENT_METHODS:
+            return 404, {}, {"message": f"unknown method {method}"}
+        with self._lock:
+            result = getattr(self.documents, method)(**json.loads(body or b"{}"))
+        if isinstance(result, list):
+            result = [vars(document) for document in result]
+        elif result is not None:
+            result = vars(result)
+        return 200, {}, result
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, headers, payload = server._handle(self.path.rsplit("/", 1)[-1], body)
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up on a hanging request
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+class HttpStatusError(Exception):
+    """Non-2xx response, carrying the status code and headers like the SDK errors do"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str]):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(status_code=status_code, headers={k.lower(): v for k, v in headers.items()})
+
+
+class HttpDocumentClient:
+    """Zep document API client for FaultServer, with a per-request timeout"""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.calls = 0
+
+    def _post(self, method: str, **kwargs) -> Any:
+        self.calls += 1
+        request = urllib.request.Request(
+            f"{self.base_url}/document/{method}",
+            data=json.dumps(kwargs).encode(),
+            headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise HttpStatusError(e.code, dict(e.headers)) from None
+        except socket.timeout:
+            raise TimeoutError(f"{method} timed out after {self.timeout}s") from None
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, socket.timeout):
+                raise TimeoutError(f"{method} timed out after {self.timeout}s") from None
+            raise ConnectionError(str(e.reason)) from None
+
+    def get_collection(self, name: str):
+        return SimpleNamespace(**self._post("get_collection", name=name))
+
+    def add_collection(self, name: str, description: str = None, metadata: Dict[str, Any] = None):
+        return SimpleNamespace(**self._post("add_collection", name=name, description=description, metadata=metadata))
+
+    def add(self, collection_name: str, documents):
+        self._post("add", collection_name=collection_name, documents=documents)
+
+    def search(self, collection_name: str, search_params: Dict[str, Any]):
+        return [SimpleNamespace(**document) for document in self._post(
+            "search", collection_name=collection_name, search_params=search_params
+        )]
+
+    def delete(self, collection_name: str, metadata: Dict[str, Any]):
+        self._post("delete", collection_name=collection_name, metadata=metadata)
+
+
+class HttpZepClient:
+    """Mimics ZepClient, talking to a FaultServer over HTTP"""
+
+    def __init__(self, base_url: str, timeout: float = 0.5):
+        self.document = HttpDocumentClient(base_url, timeout)
@@ -0,0 +1,274 @@
+"""Replay a conversation trace against the agent with local Groq, Zep and Telegram fakes
+
+Each trace line is a JSON object. The user comes from "user_id", "chat_id"
+or "request_id" and the text from "text", "message" or "title" plus
+"body", so a backlog file like requests.jsonl replays as is. An optional
+"at" is the message's offset in seconds from the start of the trace.
+Without a trace, a synthetic one of --messages messages from --users
+users is generated.
+
+Messages are sent open loop, at --rate per second, or at their recorded
+"at" times (divided by --speed) with --rate 0. Latency runs from when a
+message was due, so queueing behind a slow run is counted. --target
+agent calls GroqAgent.aprocess_message, one message per user at a time;
+--target bot goes through TelegramBot.handle_message, with per-chat
+queueing, coalescing and the replies.
+
+Reports throughput, latency percentiles, per-stage latency, peak memory
+and Groq/Zep/Telegram call counts. --save writes the results as JSON and
+--compare checks them against a saved run, exiting with status 1 if
+throughput fell or p95 latency or call counts grew by more than
+--tolerance.
+
+Usage: python benchmarks/replay.py [trace.jsonl] [--rate 20] [--target bot] [--save run.json] [--compare base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeAsyncGroq, FakeTelegramApi, FakeZepClient, bench_environment, fake_update
+from metrics import metrics
+
+
+def load_trace(path: str) -> List[Tuple[float, str, str]]:
+    """Read (at, user, text) messages from a JSONL trace, at None when not recorded"""
+    messages = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            user = next((record[key] for key in ("user_id", "chat_id", "request_id") if key in record), "user")
+            text = record.get("text") or record.get("message")
+            if text is None:
+                text = "\n\n".join(str(record[key]) for key in ("title", "body") if record.get(key))
+            messages.append((record.get("at"), str(user), text))
+    return messages
+
+
+def synthetic_trace(messages: int, users: int, seed: int) -> List[Tuple[float, str, str]]:
+    generator = random.Random(seed)
+    return [
+        (None, f"user{generator.randrange(users)}", f"message {i}: " + " ".join(["word"] * generator.randint(3, 60)))
+        for i in range(messages)
+    ]
+
+
+def schedule(trace: List[Tuple[float, str, str]], rate: float, speed: float) -> List[float]:
+    """Get the offset, in seconds from the start of the run, at which each message is due"""
+    if rate > 0:
+        return [i / rate for i in range(len(trace))]
+    if all(at is not None for at, _, _ in trace):
+        first = min(at for at, _, _ in trace)
+        return [(at - first) / speed for at, _, _ in trace]
+    # Nothing to pace by, send everything at once
+    return [0.0] * len(trace)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def replay_agent(agent, trace, due: List[float]) -> Tuple[List[float], int]:
+    """Send every message straight to the agent, serializing each user's messages like the bot does"""
+    locks = defaultdict(asyncio.Lock)
+    latencies = []
+    start = time.perf_counter()
+
+    async def send(offset: float, user: str, text: str):
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        async with locks[user]:
+            await agent.aprocess_message(user, text)
+        latencies.append(time.perf_counter() - (start + offset))
+
+    await asyncio.gather(*(send(offset, user, text) for offset, (_, user, text) in zip(due, trace)))
+    return latencies, 0
+
+
+async def replay_bot(bot, api: FakeTelegramApi, trace, due: List[float]) -> Tuple[List[float], int]:
+    """Send every message through the bot's handler and time it until the run that answered it ends"""
+    user_ids: Dict[str, int] = {}
+    pending: Dict[str, List[float]] = defaultdict(list)
+    latencies = []
+    shed = 0
+    respond = bot._respond
+
+    async def timed_respond(update, user_id: str, message_text: str):
+        started = time.perf_counter()
+        await respond(update, user_id, message_text)
+        finished = time.perf_counter()
+        # Everything that arrived before the run started was answered by it, coalesced or not
+        answered = [arrival for arrival in pending[user_id] if arrival <= started]
+        pending[user_id] = [arrival for arrival in pending[user_id] if arrival > started]
+        latencies.extend(finished - arrival for arrival in answered)
+
+    bot._respond = timed_respond
+    start = time.perf_counter()
+
+    async def send(offset: float, user: str, text: str):
+        nonlocal shed
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        user_id = user_ids.setdefault(user, len(user_ids) + 1)
+        update = fake_update(api, user_id, text)
+        pending[str(user_id)].append(time.perf_counter())
+        await bot.handle_message(update, None)
+        if update.message.replies:
+            # Turned away with a "busy" reply, never reaches the agent
+            pending[str(user_id)].pop()
+            shed += 1
+
+    await asyncio.gather(*(send(offset, user, text) for offset, (_, user, text) in zip(due, trace)))
+    while bot._chat_tasks:
+        await asyncio.gather(*bot._chat_tasks)
+    return latencies, shed
+
+
+async def run(args, trace) -> Dict[str, Any]:
+    from groq_agent import GroqAgent
+    from memory_manager import MemoryManager
+    from tools import ToolRegistry
+
+    groq = FakeAsyncGroq(
+        latency=args.llm_latency,
+        tool_calls_per_turn=args.tool_calls,
+        jitter=args.jitter,
+        tool_call_probability=args.tool_call_probability,
+        seed=args.seed
+    )
+    zep = FakeZepClient(latency=args.zep_latency)
+    agent = GroqAgent(client=groq, memory_manager=MemoryManager(zep_client=zep), tool_registry=ToolRegistry())
+    api = FakeTelegramApi(latency=args.telegram_latency)
+    due = schedule(trace, args.rate, args.speed)
+    metrics.reset()
+
+    start = time.perf_counter()
+    if args.target == "bot":
+        from telegram_bot import TelegramBot
+        latencies, shed = await replay_bot(TelegramBot(agent=agent), api, trace, due)
+    else:
+        latencies, shed = await replay_agent(agent, trace, due)
+    elapsed = time.perf_counter() - start
+    await asyncio.to_thread(agent.memory_manager.close)
+
+    snapshot = metrics.snapshot()
+    return {
+        "target": args.target,
+        "messages": len(trace),
+        "answered": len(latencies),
+        "shed": shed,
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": {
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies, default=0.0)
+        },
+        "stages": {
+            name: {"count": summary["count"], "p50": summary["p50"], "p95": summary["p95"]}
+            for name, summary in sorted(snapshot["observations"].items())
+            if name.startswith(("stage_seconds", "tool_latency_seconds"))
+        },
+        "tokens": {name: value for name, value in snapshot["counters"].items() if name.startswith("groq_tokens_total")},
+        "calls": {"groq": groq.completions.calls, "zep": zep.document.calls, **{
+            f"telegram_{method}": count for method, count in sorted(api.calls.items())
+        }},
+        # ru_maxrss is in KiB on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "python_peak_mb": tracemalloc.get_traced_memory()[1] / 1024 / 1024 if tracemalloc.is_tracing() else None
+    }
+
+
+def report(results: Dict[str, Any]):
+    latency = results["latency"]
+    print(f"target: {results['target']}  messages: {results['messages']}  answered: {results['answered']}  "
+          f"shed: {results['shed']}")
+    print(f"throughput: {results['throughput']:.1f} msg/s over {results['seconds']:.2f}s")
+    print(f"latency ms: p50 {latency['p50'] * 1000:.1f}  p95 {latency['p95'] * 1000:.1f}  "
+          f"p99 {latency['p99'] * 1000:.1f}  max {latency['max'] * 1000:.1f}")
+    print(f"{'stage':<48} {'count':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, stage in results["stages"].items():
+        print(f"{name:<48} {stage['count']:>7} {stage['p50'] * 1000:>9.1f} {stage['p95'] * 1000:>9.1f}")
+    print(f"calls: {results['calls']}")
+    print(f"tokens: {results['tokens']}")
+    memory = f"max rss: {results['max_rss_mb']:.1f} MiB"
+    if results["python_peak_mb"] is not None:
+        memory += f"  python heap peak: {results['python_peak_mb']:.1f} MiB"
+    print(memory)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Print how results differ from baseline and return whether anything regressed past tolerance"""
+    checks = [("throughput", results["throughput"], baseline["throughput"], True)]
+    checks += [(f"latency {q}", results["latency"][q], baseline["latency"][q], False) for q in ("p50", "p95")]
+    checks += [
+        (f"calls {name}", count, baseline["calls"][name], False)
+        for name, count in results["calls"].items() if name in baseline["calls"]
+    ]
+    regressed = False
+    print(f"\n{'compared to baseline':<28} {'baseline':>12} {'current':>12} {'change':>8}")
+    for label, current, base, higher_is_better in checks:
+        change = (current - base) / base if base else 0.0
+        worse = -change if higher_is_better else change
+        # Only latency percentiles are checked for the gate, p50 is shown for context
+        flag = worse > tolerance and label != "latency p50"
+        regressed = regressed or flag
+        print(f"{label:<28} {base:>12.4g} {current:>12.4g} {change:>+8.1%}{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", nargs="?")
+    parser.add_argument("--target", choices=("agent", "bot"), default="agent")
+    parser.add_argument("--rate", type=float, default=20, help="messages per second, 0 for the trace's own timing")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--tool-calls", type=int, default=1)
+    parser.add_argument("--tool-call-probability", type=float, default=0.3)
+    parser.add_argument("--zep-latency", type=float, default=0.02)
+    parser.add_argument("--telegram-latency", type=float, default=0.03)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--save")
+    parser.add_argument("--compare")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace(args.messages, args.users, args.seed)
+    if args.trace_memory:
+        tracemalloc.start()
+    with bench_environment():
+        os.environ["TELEGRAM_BOT_TOKEN"] = "123:fake"
+        os.environ["STREAM_RESPONSES"] = "true" if args.stream else "false"
+        results = asyncio.run(run(args, trace))
+    report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from typing import Any, Dict, List, Optional
+
+class ChatQueue:
+    """Per-chat queue of messages waiting for the agent, bounded across all chats
+
+    Only one runner drains a chat at a time. Messages that arrive while it
+    is busy pile up and are taken together, so they can be answered in a
+    single follow-up turn. Once max_pending messages are waiting or
+    running, new ones are refused.
+    """
+
+    def __init__(self, max_pending: int):
+        self.max_pending = max_pending
+        self.size = 0
+        self._pending: Dict[str, List[Any]] = {}
+        self._active = set()
+
+    def put(self, chat_id: str, item: Any) -> Optional[bool]:
+        """Queue an item for a chat
+
+        Returns None if the queue is full and the item was refused, True if
+        the caller must start a runner for the chat, or False if one is
+        already draining it.
+        """
+        if self.size >= self.max_pending:
+            return None
+        self._pending.setdefault(chat_id, []).append(item)
+        self.size += 1
+        if chat_id in self._active:
+            return False
+        self._active.add(chat_id)
+        return True
+
+    def take(self, chat_id: str) -> List[Any]:
+        """Take every item queued for a chat, an empty list tells the runner to stop"""
+        items = self._pending.pop(chat_id, [])
+        if not items:
+            self._active.discard(chat_id)
+        return items
+
+    def done(self, count: int):
+        """Release the capacity held by items that finished running"""
+        self.size -= count
+
+    def release(self, chat_id: str) -> int:
+        """Stop treating a chat as being drained and drop what is still queued for it
+
+        Called when a runner exits without draining its chat, so later
+        messages start a new runner. Returns how many items were dropped.
+        """
+        self._active.discard(chat_id)
+        dropped = len(self._pending.pop(chat_id, []))
+        self.size -= dropped
+        return dropped
@@ -0,0 +1,12 @@
+from memory_manager import MemoryManager
+
+def main():
+    """Compact every user's memory documents into a single snapshot"""
+    try:
+        result = MemoryManager().compact_collection()
+        print(f"Compacted {result['compacted']} of {result['users']} users")
+    except Exception as e:
+        print(f"Error compacting memories: {e}")
+
+if __name__ == "__main__":
+    main()
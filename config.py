@@ -0,0 +1,15 @@
+import threading
+from dotenv import load_dotenv
+
+_loaded = False
+_lock = threading.Lock()
+
+def load_env():
+    """Load .env into os.environ the first time it's called in a process, later calls do nothing"""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
@@ -0,0 +1,68 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, Any, List
+from ttl_cache import TTLCache
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token"""
+    return len(text or "") // 4 + 1
+
+class ConversationHistory:
+    """Recent turns per user in a bounded ring buffer
+
+    Chats idle for longer than the TTL, or pushed out by newer chats, are
+    dropped. When a chat goes over its turn limit or token budget the
+    oldest turns are handed back so the caller can fold them into a
+    summary, down to the low watermark so that happens only now and then.
+    """
+
+    def __init__(self):
+        self.max_turns = int(os.getenv("HISTORY_MAX_TURNS", "20"))
+        self.token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+        # Share of max_turns and token_budget left once a chat goes over either
+        self.low_watermark = float(os.getenv("HISTORY_LOW_WATERMARK", "0.5"))
+        self._chats = TTLCache(
+            max_size=int(os.getenv("HISTORY_MAX_CHATS", "1000")),
+            ttl=float(os.getenv("HISTORY_IDLE_TTL", "1800"))
+        )
+        self._lock = threading.Lock()
+
+    def get_turns(self, user_id: str) -> List[Dict[str, Any]]:
+        """Get the buffered turns for a user, oldest first"""
+        chat = self._chats.get(user_id)
+        return list(chat["turns"]) if chat else []
+
+    def add_turns(self, user_id: str, turns: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Append turns for a user and return the old turns evicted to stay within budget"""
+        with self._lock:
+            chat = self._chats.get(user_id) or {"turns": deque(), "tokens": 0}
+            evicted = []
+            for turn in turns:
+                chat["turns"].append(turn)
+                chat["tokens"] += estimate_tokens(turn["content"])
+            if len(chat["turns"]) > self.max_turns or chat["tokens"] > self.token_budget:
+                max_turns = int(self.max_turns * self.low_watermark)
+                token_budget = self.token_budget * self.low_watermark
+                while chat["turns"] and (len(chat["turns"]) > max_turns or chat["tokens"] > token_budget):
+                    turn = chat["turns"].popleft()
+                    chat["tokens"] -= estimate_tokens(turn["content"])
+                    evicted.append(turn)
+            # Setting the entry again restarts its idle timer
+            self._chats.set(user_id, chat)
+            return evicted
+
+    def clear(self, user_id: str):
+        """Forget every buffered turn for a user"""
+        self._chats.invalidate(user_id)
+
+    def fit_to_budget(self, turns: List[Dict[str, Any]], token_budget: int) -> List[Dict[str, Any]]:
+        """Keep the most recent turns whose combined size fits token_budget"""
+        window = []
+        for turn in reversed(turns):
+            token_budget -= estimate_tokens(turn["content"])
+            if token_budget < 0:
+                break
+            window.append(turn)
+        window.reverse()
+        return window
@@ -1,25 +1,137 @@
 import os
-from groq import Groq
-from typing import Dict, Any, List
+import asyncio
+import time
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from groq import AsyncGroq
+from types import SimpleNamespace
+from typing import Dict, Any, List, Callable, Awaitable, Tuple
 import json
-from dotenv import load_dotenv
+from config import load_env
 from memory_manager import MemoryManager
 from tools import ToolRegistry, Tool
+from ttl_cache import TTLCache
+from result_cache import ResultCache
+from metrics import metrics
+from conversation_history import ConversationHistory, estimate_tokens
+from model_router import ModelRouter, RequestBudget, load_prices, tool_call_key
+from transport import ServiceGuard, create_groq_client
 
-load_dotenv()
+load_env()
+
+# Memory key holding the rolling summary of turns evicted from the history buffer
+SUMMARY_KEY = "conversation_summary"
+
+SUMMARY_PROMPT = (
+    "Update the summary of an ongoing conversation between a user and an AI assistant. "
+    "Merge the previous summary with the new turns and keep only facts, requests and decisions "
+    "that matter for the rest of the conversation. Answer with the summary only, in at most 150 words."
+)
+
+TOOL_COMMANDS_PROMPT = (
+    "\nYou can create new tools or edit existing ones using the following commands:\n"
+    "- To create a new tool: Use the 'create_tool' command with name, description, and parameters\n"
+    "  Add 'code', Python source defining run(**arguments) that returns the result, so the tool can actually run\n"
+    "- To edit a tool: Use the 'edit_tool' command with the tool name and new description/parameters/code\n"
+    "- To delete a tool: Use the 'delete_tool' command with the tool name\n"
+    "- To view tool history: Use the 'get_tool_history' command with the tool name, and a version to see that version in full\n"
+    "- To undo changes to a tool: Use the 'rollback_tool' command with the tool name and the version to restore\n"
+    "\nWhen creating or editing tools, you can use environment variables by setting parameter type to 'env_var' and specifying the env_var_name.\n"
+    "Example parameter for using an environment variable:\n"
+    '{\n  "type": "env_var",\n  "description": "API Key for the service",\n  "env_var_name": "SERVICE_API_KEY"\n}'
+)
 
 class GroqAgent:
-    def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.memory_manager = MemoryManager()
-        self.tool_registry = ToolRegistry()
-        self.max_iterations = 10
-
-    def _create_system_prompt(self, user_id: str) -> str:
-        """Create a system prompt that includes user memories and available tools"""
-        memories = self.memory_manager.get_memories(user_id)
-        tools = self.tool_registry.get_tools()
-        env_vars = self.tool_registry.get_available_env_vars()
+    def __init__(self, client: AsyncGroq = None, memory_manager: MemoryManager = None, tool_registry: ToolRegistry = None):
+        # With LAZY_INIT the Groq client is created by the first completion instead
+        self.lazy_init = os.getenv("LAZY_INIT", "true").lower() == "true"
+        self._client = client if client is not None or self.lazy_init else create_groq_client()
+        # Deadline, retries and circuit breaker shared by every completion request
+        self.groq = ServiceGuard("groq", deadline=float(os.getenv("GROQ_DEADLINE", "60")))
+        self.memory_manager = memory_manager or MemoryManager()
+        self.tool_registry = tool_registry or ToolRegistry()
+        self.model = os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
+        # Simple messages with no relevant tools go to the small model unless MODEL_ROUTING is off
+        routing = os.getenv("MODEL_ROUTING", "true").lower() == "true"
+        self.router = ModelRouter(
+            self.model,
+            os.getenv("GROQ_SMALL_MODEL", "llama-3.1-8b-instant") if routing else None,
+            max_simple_tokens=int(os.getenv("ROUTER_MAX_SIMPLE_TOKENS", "64")),
+            tool_score=float(os.getenv("ROUTER_TOOL_SCORE", "1.0"))
+        )
+        self.model_prices = load_prices(os.getenv("MODEL_PRICES"))
+        self.max_iterations = int(os.getenv("AGENT_MAX_ITERATIONS", "10"))
+        # Past either allowance the agent stops calling tools and asks for a final answer, 0 disables them
+        self.latency_budget = float(os.getenv("AGENT_LATENCY_BUDGET", "30"))
+        self.token_budget = int(os.getenv("AGENT_TOKEN_BUDGET", "20000"))
+        self.history = ConversationHistory()
+        # Token budget for the system prompt, history window and user message together
+        self.prompt_token_budget = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+        self._background_tasks = set()
+        # Turns waiting to be summarized and the task summarizing them, per user
+        self._pending_summaries: Dict[str, List[Dict[str, Any]]] = {}
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+        # Tool calls from one model turn run concurrently: "io" tools on this
+        # thread pool, "cpu" tools on a process pool started on first use
+        self.tool_timeout = float(os.getenv("TOOL_TIMEOUT", "30"))
+        self._tool_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("MAX_PARALLEL_TOOLS", "8")),
+            thread_name_prefix="tool"
+        )
+        self._process_pool = None
+        self._loop = None
+        # Rendered prompts per user and the shared tools section, keyed by registry version
+        self._prompt_cache = TTLCache(
+            max_size=int(os.getenv("PROMPT_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("PROMPT_CACHE_TTL", "3600"))
+        )
+        self._tools_section = None
+        # Tools offered per message besides the management tools, 0 offers every tool
+        self.tool_top_k = int(os.getenv("TOOL_TOP_K", "8"))
+        # Results of tools that declare a cache_ttl, optionally persisted to RESULT_CACHE_PATH
+        cache_path = os.getenv("RESULT_CACHE_PATH")
+        max_disk_entries = int(os.getenv("RESULT_CACHE_DISK_MAX", "100000"))
+        self.tool_cache = ResultCache(
+            "tool_results",
+            max_size=int(os.getenv("TOOL_RESULT_CACHE_SIZE", "1024")),
+            default_ttl=600,
+            path=cache_path,
+            max_disk_entries=max_disk_entries
+        )
+        # Exact-match answers keyed by the whole prompt, only when COMPLETION_CACHE_TTL is set
+        completion_ttl = float(os.getenv("COMPLETION_CACHE_TTL", "0"))
+        self.completion_cache = ResultCache(
+            "completions",
+            max_size=int(os.getenv("COMPLETION_CACHE_SIZE", "1024")),
+            default_ttl=completion_ttl,
+            path=cache_path,
+            max_disk_entries=max_disk_entries
+        ) if completion_ttl > 0 else None
+
+    def _create_system_prompt(self, user_id: str, tool_names: List[str] = None, message: str = "") -> str:
+        """Create a system prompt that includes the user memories most relevant to message and available tools"""
+        memories = self.memory_manager.get_relevant_memories(user_id, message)
+        return self._build_system_prompt(user_id, memories, tool_names)
+
+    async def _acreate_system_prompt(self, user_id: str, tool_names: List[str] = None, message: str = "") -> str:
+        """Async variant of _create_system_prompt"""
+        memories = await self.memory_manager.aget_relevant_memories(user_id, message)
+        return self._build_system_prompt(user_id, memories, tool_names)
+
+    def _build_system_prompt(self, user_id: str, memories: Dict[str, Any], tool_names: List[str] = None) -> str:
+        """Render the system prompt from already-fetched user memories
+
+        Only the tools in tool_names are described, or every tool if it is
+        None. The prompt is reused until the user's memories, the selected
+        tools, the registry version or tool_keys.env change.
+        """
+        versions = (self.tool_registry.version, self.tool_registry.env_manager.get_version())
+        selection = tuple(tool_names) if tool_names is not None else None
+        cached = self._prompt_cache.get(user_id)
+        if cached is not None and cached[0] == (versions, selection) and cached[1] == memories:
+            return cached[2]
         
         prompt = "You are an AI assistant with access to user memories and tools.\n\n"
         
@@ -28,132 +140,437 @@ class GroqAgent:
             for key, value in memories.items():
                 prompt += f"- {key}: {value}\n"
         
-        if tools:
-            prompt += "\nAvailable tools:\n"
-            for tool in tools:
-                prompt += f"- {tool['name']}: {tool['description']}\n"
-                prompt += f"  Parameters: {json.dumps(tool['parameters'], indent=2)}\n"
-                prompt += f"  Created: {tool['created_at']}\n"
-                prompt += f"  Last Modified: {tool['last_modified']}\n"
-        
-        if env_vars:
-            prompt += "\nAvailable environment variables for tools:\n"
-            for key, value in env_vars.items():
-                if value:  # Only show variables that have values
-                    prompt += f"- {key}: [Available]\n"
-                else:
-                    prompt += f"- {key}: [Not configured]\n"
-        
-        prompt += "\nYou can create new tools or edit existing ones using the following commands:\n"
-        prompt += "- To create a new tool: Use the 'create_tool' command with name, description, and parameters\n"
-        prompt += "- To edit a tool: Use the 'edit_tool' command with the tool name and new description/parameters\n"
-        prompt += "- To delete a tool: Use the 'delete_tool' command with the tool name\n"
-        prompt += "- To view tool history: Use the 'get_tool_history' command with the tool name\n"
-        prompt += "\nWhen creating or editing tools, you can use environment variables by setting parameter type to 'env_var' and specifying the env_var_name.\n"
-        prompt += "Example parameter for using an environment variable:\n"
-        prompt += '{\n  "type": "env_var",\n  "description": "API Key for the service",\n  "env_var_name": "SERVICE_API_KEY"\n}'
-        
+        prompt += self._get_tools_section(versions, tool_names)
+        self._prompt_cache.set(user_id, ((versions, selection), dict(memories), prompt))
         return prompt
 
-    def _execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> Any:
-        """Execute a tool and return its result"""
-        tool = self.tool_registry.get_tool_by_name(tool_name)
-        if not tool:
-            return f"Tool {tool_name} not found"
-        
-        # Handle tool management commands
-        if tool_name == "create_tool":
-            try:
-                new_tool = self.tool_registry.create_tool(
-                    name=parameters["name"],
-                    description=parameters["description"],
-                    parameters=parameters["parameters"]
-                )
-                return f"Successfully created tool: {new_tool.to_dict()}"
-            except Exception as e:
-                return f"Error creating tool: {str(e)}"
-        
-        elif tool_name == "edit_tool":
-            try:
-                result = self.tool_registry.edit_tool(
-                    name=parameters["name"],
-                    description=parameters.get("description"),
-                    parameters=parameters.get("parameters")
+    def _get_tools_section(self, versions: tuple, tool_names: List[str] = None) -> str:
+        """Render the tools and environment variable part of the prompt
+
+        Each tool's description and the environment variable list are
+        rendered once per registry version and reused for any selection.
+        """
+        if self._tools_section is None or self._tools_section[0] != versions:
+            fragments = {}
+            for tool in self.tool_registry.get_tools():
+                fragments[tool['name']] = (
+                    f"- {tool['name']}: {tool['description']}\n"
+                    f"  Parameters: {json.dumps(tool['parameters'], indent=2)}\n"
+                    f"  Created: {tool['created_at']}\n"
+                    f"  Last Modified: {tool['last_modified']}\n"
                 )
-                return f"Tool edited successfully. {result['warning']}\nOriginal: {result['original_tool'].to_dict()}\nUpdated: {result['updated_tool'].to_dict()}"
-            except Exception as e:
-                return f"Error editing tool: {str(e)}"
-        
-        elif tool_name == "delete_tool":
-            try:
-                self.tool_registry.delete_tool(parameters["name"])
-                return f"Successfully deleted tool: {parameters['name']}"
-            except Exception as e:
-                return f"Error deleting tool: {str(e)}"
-        
-        elif tool_name == "get_tool_history":
+            
+            env_vars = self.tool_registry.get_available_env_vars()
+            env_section = ""
+            if env_vars:
+                env_section += "\nAvailable environment variables for tools:\n"
+                for key, value in env_vars.items():
+                    if value:  # Only show variables that have values
+                        env_section += f"- {key}: [Available]\n"
+                    else:
+                        env_section += f"- {key}: [Not configured]\n"
+            self._tools_section = (versions, fragments, env_section)
+
+        _, fragments, env_section = self._tools_section
+        names = tool_names if tool_names is not None else list(fragments)
+        tool_lines = "".join(fragments[name] for name in names if name in fragments)
+        section = ""
+        if tool_lines:
+            section += "\nAvailable tools:\n" + tool_lines
+        return section + env_section + TOOL_COMMANDS_PROMPT
+
+    async def _execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> str:
+        """Execute a tool through the executor bound to it and return its result
+
+        Results of tools with a cache_ttl are reused for the same arguments.
+        The key includes the tool's last_modified, so editing a tool stops
+        its old results from being served.
+        """
+        executor = self.tool_registry.get_executor(tool_name)
+        if executor is None:
+            return f"Tool {tool_name} not found"
+        if executor.fn is None:
+            return "Tool execution not implemented"
+        arguments = executor.validate(parameters)
+
+        cache_key = None
+        if executor.tool.cache_ttl:
+            cache_key = ResultCache.make_key(tool_name, executor.tool.last_modified, arguments)
+            cached = self.tool_cache.get(cache_key)
+            metrics.increment("cache_requests_total", cache="tool", result="miss" if cached is None else "hit")
+            if cached is not None:
+                return cached
+
+        call_arguments = executor.bind_env(arguments)
+        if executor.is_async:
+            result = await executor.fn(**call_arguments)
+        else:
+            pool = self._get_process_pool() if executor.cost_class == "cpu" else self._tool_executor
+            loop = asyncio.get_running_loop()
             try:
-                history = self.tool_registry.get_tool_history(parameters["name"])
-                return f"Tool history: {json.dumps(history, indent=2)}"
-            except Exception as e:
-                return f"Error getting tool history: {str(e)}"
-        
-        # Handle regular tools
-        elif tool_name == "search_web":
-            return f"Searching web for: {parameters['query']}"
-        elif tool_name == "calculate":
-            return f"Calculating: {parameters['expression']}"
-        
-        return "Tool execution not implemented"
+                result = await loop.run_in_executor(pool, functools.partial(executor.fn, **call_arguments))
+            except BrokenProcessPool:
+                # A crashed worker breaks the whole pool, the next call starts a new one
+                if pool is self._process_pool:
+                    self._process_pool = None
+                raise
+        result = str(result)
+        if cache_key is not None:
+            self.tool_cache.set(cache_key, result, ttl=executor.tool.cache_ttl)
+        return result
 
-    def process_message(self, user_id: str, message: str) -> str:
-        """Process a user message with thinking and tool usage"""
-        system_prompt = self._create_system_prompt(user_id)
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Get the pool that runs "cpu" tools, started on first use"""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=int(os.getenv("TOOL_PROCESSES", "0")) or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    def _recycle_process_pool(self):
+        """Kill the processes running "cpu" tools, the next call starts a new pool
+
+        Timing out only stops waiting, the job keeps its process busy until
+        it finishes, so after a timeout the pool is replaced. Other calls
+        running in it fail with BrokenProcessPool.
+        """
+        pool, self._process_pool = self._process_pool, None
+        if pool is None:
+            return
+        # ProcessPoolExecutor has no public way to stop a busy worker
+        for process in list(pool._processes.values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def aprocess_message(self, user_id: str, message: str, on_token: Callable[[str], Awaitable[None]] = None) -> str:
+        """Process a user message with thinking and tool usage without blocking the event loop
+
+        If on_token is given, completions are streamed and every content
+        delta is awaited through it as it arrives. Simple messages start on
+        the router's small model, and the tool loop ends with a final
+        answer without tools once calls only repeat or a budget runs out.
+        """
+        request_start = time.perf_counter()
+        first_token = True
+
+        async def forward_token(token: str):
+            nonlocal first_token
+            if first_token:
+                first_token = False
+                metrics.observe("time_to_first_token_seconds", time.perf_counter() - request_start)
+            await on_token(token)
+
+        with metrics.span("select_tools"):
+            tool_names = self.tool_registry.select_tools(message, self.tool_top_k)
+            api_tools = self.tool_registry.get_api_tools(tool_names)
+            model, route = self.router.route(message, self.tool_registry.score_tools)
+        metrics.increment("model_routes_total", model=model, reason=route)
+        with metrics.span("system_prompt"):
+            system_prompt = await self._acreate_system_prompt(user_id, tool_names, message)
+        user_turn = {"role": "user", "content": message}
+        history_budget = self.prompt_token_budget - estimate_tokens(system_prompt) - estimate_tokens(message)
         messages = [
             {"role": "system", "content": system_prompt},
-            {"role": "user", "content": message}
+            *self.history.fit_to_budget(self.history.get_turns(user_id), history_budget),
+            user_turn
         ]
-        
-        for iteration in range(self.max_iterations):
+
+        completion_key = None
+        if self.completion_cache is not None:
+            completion_key = ResultCache.make_key(model, messages)
+            cached = self.completion_cache.get(completion_key)
+            metrics.increment("cache_requests_total", cache="completion", result="miss" if cached is None else "hit")
+            if cached is not None:
+                if on_token is not None:
+                    await forward_token(cached)
+                self._record_turns(user_id, [user_turn, {"role": "assistant", "content": cached}])
+                return cached
+
+        budget = RequestBudget(self.latency_budget, self.token_budget)
+        stream_to = forward_token if on_token is not None else None
+        # Results of the tool calls made so far, by tool name and arguments
+        results: Dict[Tuple[str, str], str] = {}
+        iterations = 0
+        while True:
             # Get AI response
-            response = self.client.chat.completions.create(
-                messages=messages,
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
-                tools=self.tool_registry.get_tools()
-            )
-            
-            message = response.choices[0].message
-            
-            # Check if the AI wants to use a tool
+            message = await self._complete(messages, api_tools, model, budget, stream_to)
+            if model != self.router.large_model and (getattr(message, 'tool_calls', None) or not message.content):
+                # Tools or an empty answer mean the message wasn't that simple, the large model redoes the turn
+                metrics.increment("model_escalations_total", reason="tool_call" if message.tool_calls else "empty")
+                model = self.router.large_model
+                continue
+            iterations += 1
+
+            # Check if the AI wants to use tools
             if hasattr(message, 'tool_calls') and message.tool_calls:
-                tool_call = message.tool_calls[0]
-                tool_name = tool_call.function.name
-                parameters = json.loads(tool_call.function.arguments)
-                
-                # Execute the tool
-                tool_result = self._execute_tool(tool_name, parameters)
-                
-                # Add tool result to messages
-                messages.append({
-                    "role": "assistant",
-                    "content": None,
-                    "tool_calls": [tool_call]
-                })
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "content": str(tool_result)
-                })
+                repeated_only = await self._run_tool_calls(message.tool_calls, messages, results)
+                stop = "repeated_tool_call" if repeated_only else budget.exceeded()
+                if stop is None and iterations >= self.max_iterations:
+                    stop = "max_iterations"
+                if stop is None:
+                    continue
+                # Ask for an answer from what the tools returned so far instead of another round
+                metrics.increment("agent_early_exits_total", reason=stop)
+                message = await self._complete(messages, api_tools, model, budget, stream_to, tool_choice="none")
+                iterations += 1
+                content = message.content or "Maximum iterations reached without a final response"
             else:
                 # AI has a final response
-                return message.content
-        
-        return "Maximum iterations reached without a final response"
+                content = message.content or "No response was generated"
+                if completion_key is not None and not results and message.content:
+                    # Answers that needed tools may depend on side effects or fresh data
+                    self.completion_cache.set(completion_key, content)
+            metrics.observe("agent_iterations", iterations)
+            self._record_turns(user_id, [user_turn, {"role": "assistant", "content": content}])
+            return content
+
+    async def _complete(self, messages: List[Dict[str, Any]], api_tools: List[Dict[str, Any]], model: str,
+                        budget: RequestBudget, on_token: Callable[[str], Awaitable[None]] = None, **kwargs):
+        """Run one completion on model, streamed through on_token if given, and charge its tokens to budget"""
+        metrics.increment("completions_total", model=model)
+        with metrics.span("completion", model=model):
+            if on_token is not None:
+                message = await self._stream_completion(messages, api_tools, on_token, model, **kwargs)
+                usage = message.usage
+            else:
+                response = await self.groq.acall(
+                    self.client.chat.completions.create,
+                    messages=messages,
+                    model=model,
+                    tools=api_tools,
+                    **kwargs
+                )
+                message = response.choices[0].message
+                usage = getattr(response, "usage", None)
+        tokens = self._record_usage(usage, model)
+        if tokens is None:
+            # Without usage from Groq the budget goes by the estimate
+            tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in messages)
+            tokens += estimate_tokens(message.content or "")
+        budget.add(tokens)
+        return message
+
+    async def _run_tool_calls(self, tool_calls, messages: List[Dict[str, Any]], results: Dict[Tuple[str, str], str]) -> bool:
+        """Execute one turn's tool calls concurrently and add them and their results to messages
+
+        A call repeating an earlier one with the same arguments isn't run
+        again, the model gets the earlier result back with a note saying so.
+        Returns whether every call in the turn was such a repeat.
+        """
+        keys = [tool_call_key(tool_call.function.name, tool_call.function.arguments) for tool_call in tool_calls]
+        new_calls = {}
+        for key, tool_call in zip(keys, tool_calls):
+            if key not in results and key not in new_calls:
+                new_calls[key] = tool_call
+        tool_results = await asyncio.gather(*(self._run_tool_call(tool_call) for tool_call in new_calls.values()))
+        results.update(zip(new_calls, tool_results))
+
+        # Add tool results to messages, in the order the calls were made
+        messages.append({
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments}
+                }
+                for tool_call in tool_calls
+            ]
+        })
+        for key, tool_call in zip(keys, tool_calls):
+            content = results[key]
+            if new_calls.get(key) is not tool_call:
+                metrics.increment("tool_calls_repeated_total", tool=tool_call.function.name)
+                content += f"\n(Same result as an earlier {tool_call.function.name} call with these arguments, don't call it again)"
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call.id,
+                "content": content
+            })
+        return not new_calls
+
+    async def _stream_completion(self, messages: List[Dict[str, Any]], api_tools: List[Dict[str, Any]],
+                                 on_token: Callable[[str], Awaitable[None]], model: str = None, **kwargs):
+        """Run a streaming completion, forwarding content deltas and reassembling tool calls
+
+        Only opening the stream is retried, a stream that breaks after
+        tokens were forwarded raises. The returned message carries the
+        token usage Groq reported, if any.
+        """
+        stream = await self.groq.acall(
+            self.client.chat.completions.create,
+            messages=messages,
+            model=model or self.model,
+            tools=api_tools,
+            stream=True,
+            **kwargs
+        )
+        content = []
+        tool_calls: Dict[int, Dict[str, str]] = {}
+        usage = None
+        async for chunk in stream:
+            # Groq reports token usage on the last chunk of a stream
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                usage = x_groq.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                content.append(delta.content)
+                await on_token(delta.content)
+            # Tool calls arrive in fragments keyed by their index in the turn
+            for tool_call in delta.tool_calls or []:
+                call = tool_calls.setdefault(tool_call.index, {"id": None, "name": "", "arguments": ""})
+                if tool_call.id:
+                    call["id"] = tool_call.id
+                if tool_call.function:
+                    call["name"] += tool_call.function.name or ""
+                    call["arguments"] += tool_call.function.arguments or ""
+
+        return SimpleNamespace(
+            content="".join(content) or None,
+            tool_calls=[
+                SimpleNamespace(
+                    id=call["id"],
+                    type="function",
+                    function=SimpleNamespace(name=call["name"], arguments=call["arguments"] or "{}")
+                )
+                for _, call in sorted(tool_calls.items())
+            ] or None,
+            usage=usage
+        )
+
+    @property
+    def client(self) -> AsyncGroq:
+        """The Groq client, created on first use"""
+        if self._client is None:
+            self._client = create_groq_client()
+        return self._client
+
+    def _record_usage(self, usage, model: str = None) -> int:
+        """Count the tokens a completion used and what they cost, as reported by Groq
+
+        Returns the total tokens, or None when Groq didn't report usage.
+        """
+        if usage is None:
+            return None
+        model = model or self.model
+        prices = self.model_prices.get(model)
+        total = 0
+        for kind, price in zip(("prompt", "completion"), prices or (0, 0)):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if tokens:
+                total += tokens
+                metrics.increment("groq_tokens_total", tokens, model=model, type=kind)
+                metrics.observe(f"{kind}_tokens", tokens, model=model)
+                if prices:
+                    metrics.increment("groq_cost_dollars_total", tokens * price / 1_000_000, model=model)
+        return total
+
+    async def clear_user(self, user_id: str):
+        """Forget everything about a user: memories, history and turns still waiting to be summarized"""
+        # A summary finishing after the clear would bring the old conversation back
+        self._pending_summaries.pop(user_id, None)
+        task = self._summary_tasks.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.memory_manager.aclear_memories(user_id)
+        self.history.clear(user_id)
+
+    def _record_turns(self, user_id: str, turns: List[Dict[str, Any]]):
+        """Add turns to the user's history and summarize whatever falls out of it in the background"""
+        evicted = self.history.add_turns(user_id, turns)
+        if not evicted:
+            return
+        self._pending_summaries.setdefault(user_id, []).extend(evicted)
+        if user_id in self._summary_tasks:
+            # The running summary picks these turns up when it's done
+            return
+        task = asyncio.get_running_loop().create_task(self._summarize_pending(user_id))
+        self._summary_tasks[user_id] = task
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _summarize_pending(self, user_id: str):
+        """Summarize the user's evicted turns one batch at a time, so no update overwrites another"""
+        try:
+            while self._pending_summaries.get(user_id):
+                await self._summarize_turns(user_id, self._pending_summaries.pop(user_id))
+        finally:
+            # clear_user may already have replaced this task with a newer one
+            if self._summary_tasks.get(user_id) is asyncio.current_task():
+                del self._summary_tasks[user_id]
+
+    async def _summarize_turns(self, user_id: str, turns: List[Dict[str, Any]]):
+        """Fold turns evicted from the history into the user's rolling conversation summary"""
+        # Summarizing is simple enough for the small model when routing has one
+        model = self.router.small_model or self.model
+        try:
+            memories = await self.memory_manager.aget_memories(user_id)
+            transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+            response = await self.groq.acall(
+                self.client.chat.completions.create,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Previous summary:\n{memories.get(SUMMARY_KEY, '')}\n\nNew turns:\n{transcript}"}
+                ],
+                model=model
+            )
+            self._record_usage(getattr(response, "usage", None), model)
+            await self.memory_manager.aupdate_memory(user_id, SUMMARY_KEY, response.choices[0].message.content)
+        except Exception as e:
+            print(f"Error summarizing conversation: {e}")
+
+    async def _run_tool_call(self, tool_call) -> str:
+        """Execute one tool call, giving up after tool_timeout seconds"""
+        tool_name = tool_call.function.name
+        start = time.perf_counter()
+        try:
+            parameters = json.loads(tool_call.function.arguments)
+            tool_result = await asyncio.wait_for(self._execute_tool(tool_name, parameters), timeout=self.tool_timeout)
+            status = "ok"
+        except asyncio.TimeoutError:
+            tool_result = f"Tool {tool_name} timed out after {self.tool_timeout} seconds"
+            status = "timeout"
+            executor = self.tool_registry.get_executor(tool_name)
+            if executor is not None and executor.cost_class == "cpu" and not executor.is_async:
+                self._recycle_process_pool()
+        except Exception as e:
+            tool_result = f"Error executing tool {tool_name}: {str(e)}"
+            status = "error"
+        # Labelled by version so a regression after an edit shows up next to the version before it
+        version = self.tool_registry.history.get_latest_version(tool_name)
+        metrics.observe("tool_latency_seconds", time.perf_counter() - start, tool=tool_name, version=version)
+        metrics.increment("tool_calls_total", tool=tool_name, status=status, version=version)
+        return str(tool_result)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit ratios of the prompt, tool result and completion caches"""
+        return {
+            "prompts": self._prompt_cache.get_stats(),
+            "tool_results": self.tool_cache.get_stats(),
+            "completions": self.completion_cache.get_stats() if self.completion_cache is not None else None
+        }
+
+    def process_message(self, user_id: str, message: str) -> str:
+        """Synchronous wrapper around aprocess_message for scripts"""
+        # Reuse one loop so the async client's connection pool stays bound to it
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.aprocess_message(user_id, message))
 
     def update_user_memory(self, user_id: str, key: str, value: Any):
         """Update user memory with new information"""
         self.memory_manager.update_memory(user_id, key, value)
 
+    async def aupdate_user_memory(self, user_id: str, key: str, value: Any):
+        """Async variant of update_user_memory"""
+        await self.memory_manager.aupdate_memory(user_id, key, value)
+
 # Example usage
 if __name__ == "__main__":
     agent = GroqAgent()
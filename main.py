@@ -1,10 +1,10 @@
 import os
 from telegram_bot import TelegramBot
-from dotenv import load_dotenv
+from config import load_env
 
 def main():
     # Load environment variables
-    load_dotenv()
+    load_env()
     
     # Check required environment variables
     required_vars = [
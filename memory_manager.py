@@ -1,100 +1,664 @@
-from zep_python import ZepClient
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, Callable, Iterable, List, Optional
+import asyncio
+import atexit
+import bisect
+import itertools
 import json
 import os
-from dotenv import load_dotenv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import load_env
+from ttl_cache import TTLCache
+from transport import ServiceGuard, create_zep_client
+from metrics import metrics
+from memory_ranking import MemoryIndex, select_memories
 
-load_dotenv()
+load_env()
+
+if TYPE_CHECKING:
+    from zep_python import ZepClient
+
+# Documents written before snapshots existed, each holding a full memory dict
+LEGACY_TYPE = "user_memory"
+SNAPSHOT_TYPE = "user_memory_snapshot"
+_MISSING = object()
+
+def _read_checkpoint(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def _write_checkpoint(path: Optional[str], checkpoint: Dict[str, Any]):
+    if not path:
+        return
+    # Replaced atomically so a crash leaves either the old or the new checkpoint
+    with open(path + ".tmp", 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+def _clear_checkpoint(path: Optional[str]):
+    if path and os.path.exists(path):
+        os.remove(path)
 
 class MemoryManager:
-    def __init__(self):
-        self.zep_client = ZepClient(
-            base_url=os.getenv("ZEP_API_URL", "https://api.zep.cloud"),
-            api_key=os.getenv("ZEP_API_KEY")
-        )
+    def __init__(self, zep_client: "ZepClient" = None):
+        self._zep_client = zep_client
+        self._client_lock = threading.Lock()
+        # Deadline, retries and circuit breaker shared by every Zep call
+        self.zep = ServiceGuard("zep", deadline=float(os.getenv("ZEP_DEADLINE", "8")))
         self.collection_name = "user_memory"
-        self._ensure_collection_exists()
+        # Snapshots kept per generation before older ones are garbage-collected
+        self.compact_every = int(os.getenv("MEMORY_COMPACT_EVERY", "5"))
+        # Per-user storage state, written through on update and invalidated on clear
+        self.cache = TTLCache(
+            max_size=int(os.getenv("MEMORY_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("MEMORY_CACHE_TTL", "300"))
+        )
+        self.zep_calls = 0
+        # Write-behind queue: acknowledged updates per user, coalesced by key
+        self.flush_interval = float(os.getenv("MEMORY_FLUSH_INTERVAL", "2"))
+        self.flush_batch_size = int(os.getenv("MEMORY_FLUSH_BATCH", "50"))
+        # Zep requests in flight at once for operations on many users
+        self.batch_concurrency = int(os.getenv("MEMORY_BATCH_CONCURRENCY", "8"))
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+        self._pending_lock = threading.Lock()
+        # Serializes every Zep write so a clear can't race a flush
+        self._write_lock = threading.RLock()
+        self._flush_event = threading.Event()
+        self._flusher = None
+        self._closed = False
+        # Memories put in the prompt: the most relevant ones within a count and token budget, plus pinned keys
+        self.top_k = int(os.getenv("MEMORY_TOP_K", "20"))
+        self.token_budget = int(os.getenv("MEMORY_TOKEN_BUDGET", "600"))
+        self.pinned_keys = [
+            key.strip()
+            for key in os.getenv("MEMORY_PINNED_KEYS", "language,name,conversation_summary").split(",")
+            if key.strip()
+        ]
+        self.recency_weight = float(os.getenv("MEMORY_RECENCY_WEIGHT", "0.3"))
+        self.recency_half_life = float(os.getenv("MEMORY_RECENCY_HALF_LIFE_DAYS", "30")) * 86400
+        # Relevance index per user, kept as long as the user's cached state
+        self._indexes = TTLCache(max_size=self.cache.max_size, ttl=self.cache.ttl)
+        atexit.register(self.close)
+        # With LAZY_INIT the Zep client is created and the collection checked in
+        # the background, so a slow Zep doesn't hold up startup
+        self.lazy_init = os.getenv("LAZY_INIT", "true").lower() == "true"
+        self._collection_ready = False
+        self._collection_lock = threading.Lock()
+        if self.lazy_init:
+            threading.Thread(target=self._check_collection, name="zep-collection-check", daemon=True).start()
+        else:
+            self._ensure_collection_exists()
 
-    def _ensure_collection_exists(self):
+    @property
+    def zep_client(self) -> "ZepClient":
+        """The Zep client, created on first use"""
+        if self._zep_client is None:
+            with self._client_lock:
+                if self._zep_client is None:
+                    self._zep_client = create_zep_client()
+        return self._zep_client
+
+    def _check_collection(self):
         try:
-            self.zep_client.document.get_collection(self.collection_name)
-        except Exception as e:
-            print(f"Error accessing collection: {e}")
-            # Create collection if it doesn't exist
+            self._ensure_collection_exists()
+        except Exception:
+            # Already reported, the next write tries again
+            pass
+
+    def _ensure_collection_exists(self):
+        """Check the collection exists, creating it if needed; after one success this returns at once"""
+        if self._collection_ready:
+            return
+        with self._collection_lock:
+            if self._collection_ready:
+                return
             try:
-                self.zep_client.document.add_collection(
-                    name=self.collection_name,
-                    description="User memory storage",
-                    metadata={"type": "user_memory"}
-                )
+                self._call_zep("get_collection", self.collection_name)
             except Exception as e:
-                print(f"Error creating collection: {e}")
-                raise
+                print(f"Error accessing collection: {e}")
+                # Create collection if it doesn't exist
+                try:
+                    self._call_zep(
+                        "add_collection",
+                        name=self.collection_name,
+                        description="User memory storage",
+                        metadata={"type": "user_memory"}
+                    )
+                except Exception as e:
+                    print(f"Error creating collection: {e}")
+                    raise
+            self._collection_ready = True
 
-    def store_memory(self, user_id: str, memory_data: Dict[str, Any]):
-        """Store a memory about the user"""
-        try:
-            document = {
-                "content": json.dumps(memory_data),
-                "metadata": {
-                    "user_id": user_id,
-                    "type": "user_memory"
-                }
-            }
-            self.zep_client.document.add(
-                collection_name=self.collection_name,
-                documents=[document]
-            )
-        except Exception as e:
-            print(f"Error storing memory: {e}")
-            raise
+    def _call_zep(self, method: str, *args, **kwargs) -> Any:
+        """Call a Zep document API method through the retry policy and circuit breaker"""
+        self.zep_calls += 1
+        return self.zep.call(getattr(self.zep_client.document, method), *args, **kwargs)
 
-    def get_memories(self, user_id: str) -> Dict[str, Any]:
-        """Retrieve all memories for a user"""
+    def _empty_state(self) -> Dict[str, Any]:
+        return {"memories": {}, "updated_at": {}, "generation": 0, "generations": [], "documents": 0, "legacy": False}
+
+    def _state_from_documents(self, documents: List[Any]) -> Dict[str, Any]:
+        """Rebuild a user's memories from their stored documents
+
+        Legacy documents are merged in the order returned. Each snapshot holds
+        the complete memory dict, so only the newest one has to be parsed.
+        """
+        state = self._empty_state()
+        snapshots = []
+        for document in documents:
+            metadata = document.metadata or {}
+            if metadata.get("type") == SNAPSHOT_TYPE:
+                snapshots.append(document)
+                continue
+            state["legacy"] = True
+            try:
+                state["memories"].update(json.loads(document.content))
+            except Exception as e:
+                print(f"Error parsing memory data: {e}")
+        if snapshots:
+            latest = max(snapshots, key=lambda d: (d.metadata.get("generation", 0), d.metadata.get("version", 0)))
+            try:
+                state["memories"].update(json.loads(latest.content))
+            except Exception as e:
+                print(f"Error parsing memory data: {e}")
+            state["updated_at"] = dict(latest.metadata.get("updated_at") or {})
+            state["generation"] = latest.metadata.get("generation", 0)
+            state["generations"] = sorted({d.metadata.get("generation", 0) for d in snapshots})
+            state["documents"] = len(snapshots)
+        return state
+
+    def _get_state(self, user_id: str, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """Get the cached storage state for a user, reading it from Zep on a miss
+
+        With allow_stale, an expired cache entry is returned when Zep can't
+        be read, for example while its circuit breaker is open.
+        """
+        state = self.cache.get(user_id)
+        metrics.increment("cache_requests_total", cache="memory", result="miss" if state is None else "hit")
+        if state is None:
+            with metrics.span("memory_fetch"):
+                state = self._fetch_state(user_id)
+            if state is not None:
+                self.cache.set(user_id, state)
+            elif allow_stale:
+                state = self.cache.get_stale(user_id)
+                if state is not None:
+                    metrics.increment("memory_stale_reads_total")
+        return state
+
+    def _fetch_state(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Read every stored memory document for a user, None on failure"""
         try:
-            search_results = self.zep_client.document.search(
+            search_results = self._call_zep(
+                "search",
                 collection_name=self.collection_name,
                 search_params={
                     "metadata": {
-                        "user_id": user_id,
-                        "type": "user_memory"
+                        "user_id": user_id
                     }
                 }
             )
-            
-            memories = {}
-            for result in search_results:
-                try:
-                    memory_data = json.loads(result.content)
-                    memories.update(memory_data)
-                except Exception as e:
-                    print(f"Error parsing memory data: {e}")
-                    continue
-            return memories
+            return self._state_from_documents(search_results)
         except Exception as e:
             print(f"Error retrieving memories: {e}")
-            return {}
+            return None
+
+    def _prepare_snapshot(self, user_id: str, state: Dict[str, Any], memories: Dict[str, Any], compact: bool = False,
+                          updated_at: Dict[str, float] = None):
+        """Build the snapshot document for memories and the storage state that follows it
+
+        Snapshots are appended to the current generation. Once a generation
+        holds `compact_every` snapshots (or legacy documents remain), the new
+        snapshot starts the next generation and the older ones are deleted.
+        Times in updated_at, such as those of imported memories, replace the
+        ones worked out from what changed.
+        """
+        compact = compact or state["legacy"] or state["documents"] >= self.compact_every
+        generation = state["generation"] + 1 if compact else state["generation"]
+        # When each memory last changed, used to favour recent memories in the prompt
+        now = time.time()
+        previous, previous_times = state["memories"], state.get("updated_at", {})
+        times = {
+            key: previous_times.get(key, 0.0) if key in previous and previous[key] == value else now
+            for key, value in memories.items()
+        }
+        times.update({key: at for key, at in (updated_at or {}).items() if key in memories})
+        document = {
+            "content": json.dumps(memories),
+            "metadata": {
+                "user_id": user_id,
+                "type": SNAPSHOT_TYPE,
+                "generation": generation,
+                "version": time.time_ns(),
+                "updated_at": times
+            }
+        }
+        new_state = {
+            "memories": dict(memories),
+            "updated_at": times,
+            "generation": generation,
+            "generations": sorted(set(state["generations"]) | {generation}),
+            "documents": state["documents"] + 1,
+            "legacy": state["legacy"]
+        }
+        if compact:
+            new_state.update(generations=[generation], documents=1, legacy=False)
+        return document, new_state, compact
+
+    def _add_documents(self, documents: List[Dict[str, Any]]):
+        """Add documents to the collection in chunks of flush_batch_size"""
+        self._ensure_collection_exists()
+        for i in range(0, len(documents), self.flush_batch_size):
+            self._call_zep(
+                "add",
+                collection_name=self.collection_name,
+                documents=documents[i:i + self.flush_batch_size]
+            )
+
+    def _write_snapshot(self, user_id: str, state: Dict[str, Any], memories: Dict[str, Any], compact: bool = False):
+        """Add a snapshot of the complete memory dict and garbage-collect older ones
+
+        The snapshot is written before anything is deleted.
+        """
+        with self._write_lock:
+            document, new_state, compact = self._prepare_snapshot(user_id, state, memories, compact)
+            self._add_documents([document])
+            if compact:
+                self._delete_stale(user_id, state)
+            self.cache.set(user_id, new_state)
+
+    def _delete_stale(self, user_id: str, state: Dict[str, Any]):
+        """Delete the snapshot generations and legacy documents listed in state"""
+        stale = [{"type": SNAPSHOT_TYPE, "generation": generation} for generation in state["generations"]]
+        if state["legacy"]:
+            stale.append({"type": LEGACY_TYPE})
+        for metadata in stale:
+            try:
+                self._call_zep(
+                    "delete",
+                    collection_name=self.collection_name,
+                    metadata={"user_id": user_id, **metadata}
+                )
+            except Exception as e:
+                # Readers always pick the newest generation, a later compaction retries
+                print(f"Error compacting memories: {e}")
+
+    def store_memory(self, user_id: str, memory_data: Dict[str, Any]):
+        """Store memories about the user right away, merged over the ones already stored"""
+        try:
+            with self._write_lock:
+                state = self._get_state(user_id) or self._empty_state()
+                self._write_snapshot(user_id, state, {**state["memories"], **memory_data})
+        except Exception as e:
+            print(f"Error storing memory: {e}")
+            self.cache.invalidate(user_id)
+            raise
+
+    def get_memories(self, user_id: str) -> Dict[str, Any]:
+        """Retrieve all memories for a user, including updates not flushed yet
+
+        If Zep is unreachable the last memories cached for the user are used.
+        """
+        return self._get_memories_with_times(user_id)[0]
+
+    def _get_memories_with_times(self, user_id: str):
+        """Get a user's memories, including unflushed updates, and when each one last changed"""
+        state = self._get_state(user_id, allow_stale=True)
+        memories = dict(state["memories"]) if state else {}
+        updated_at = dict(state.get("updated_at", {})) if state else {}
+        with self._pending_lock:
+            unflushed = {**self._inflight.get(user_id, {}), **self._pending.get(user_id, {})}
+        memories.update(unflushed)
+        now = time.time()
+        updated_at.update({key: now for key in unflushed})
+        return memories, updated_at
+
+    def get_relevant_memories(self, user_id: str, query: str) -> Dict[str, Any]:
+        """Get the memories worth putting in a prompt about query
+
+        Pinned keys are always included. The others are ranked by relevance
+        to query and recency, and kept within MEMORY_TOP_K memories and
+        MEMORY_TOKEN_BUDGET estimated tokens.
+        """
+        memories, updated_at = self._get_memories_with_times(user_id)
+        index = self._indexes.get(user_id)
+        if index is None:
+            index = MemoryIndex()
+            self._indexes.set(user_id, index)
+        return select_memories(
+            memories,
+            updated_at,
+            query,
+            top_k=self.top_k,
+            token_budget=self.token_budget,
+            pinned=self.pinned_keys,
+            recency_weight=self.recency_weight,
+            half_life=self.recency_half_life,
+            index=index
+        )
 
     def update_memory(self, user_id: str, key: str, value: Any):
-        """Update a specific memory for a user"""
+        """Update a specific memory for a user
+
+        The update is queued and written by the background flusher. Once this
+        returns the value is visible to get_memories and will be flushed, at
+        the latest on close().
+        """
+        if self._closed:
+            raise RuntimeError("MemoryManager is closed")
+        with self._pending_lock:
+            pending = self._pending.get(user_id, {})
+            if key in pending:
+                current = pending[key]
+            elif key in self._inflight.get(user_id, {}):
+                current = self._inflight[user_id][key]
+            else:
+                state = self.cache.get(user_id)
+                current = state["memories"].get(key, _MISSING) if state else _MISSING
+            if current == value:
+                return
+            self._pending.setdefault(user_id, {})[key] = value
+            queued = sum(len(changes) for changes in self._pending.values())
+        self._start_flusher()
+        if queued >= self.flush_batch_size:
+            self._flush_event.set()
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            with self._pending_lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="memory-flusher", daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing memories: {e}")
+
+    def flush(self) -> int:
+        """Write every queued update to Zep in batched document.add calls
+
+        Returns the number of snapshots written. On failure the updates are
+        put back in the queue, under any newer value for the same key.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return 0
+            try:
+                return self._write_changes(batch)
+            except Exception:
+                with self._pending_lock:
+                    for user_id, changes in batch.items():
+                        pending = self._pending.setdefault(user_id, {})
+                        for key, value in changes.items():
+                            pending.setdefault(key, value)
+                raise
+            finally:
+                with self._pending_lock:
+                    self._inflight = {}
+
+    def _write_changes(self, changes_by_user: Dict[str, Dict[str, Any]],
+                       updated_at: Dict[str, Dict[str, float]] = None) -> int:
+        """Merge changes into each user's stored memories, holding _write_lock
+
+        The users' states are read concurrently and every snapshot goes out
+        in chunked document.add calls. Returns the number of snapshots written.
+        """
+        user_ids = list(changes_by_user)
+        states = dict(zip(user_ids, self._map(self._get_state, user_ids)))
+        writes = []
+        for user_id, changes in changes_by_user.items():
+            state = states[user_id]
+            if state is None:
+                raise RuntimeError(f"could not read memories for user {user_id}")
+            memories = {**state["memories"], **changes}
+            if memories == state["memories"]:
+                continue
+            document, new_state, compact = self._prepare_snapshot(
+                user_id, state, memories, updated_at=(updated_at or {}).get(user_id)
+            )
+            writes.append((user_id, state, document, new_state, compact))
+
+        self._add_documents([document for _, _, document, _, _ in writes])
+        compacted = [(user_id, state) for user_id, state, _, _, compact in writes if compact]
+        self._map(lambda item: self._delete_stale(*item), compacted)
+        for user_id, _, _, new_state, _ in writes:
+            self.cache.set(user_id, new_state)
+        return len(writes)
+
+    def _map(self, fn: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """Apply fn to every item on up to batch_concurrency threads, returning the results in order"""
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.batch_concurrency, len(items)), thread_name_prefix="memory-batch") as pool:
+            return list(pool.map(fn, items))
+
+    def get_memories_many(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Retrieve the memories of many users, reading the uncached ones from Zep concurrently"""
+        user_ids = list(dict.fromkeys(user_ids))
+        return dict(zip(user_ids, self._map(self.get_memories, user_ids)))
+
+    def update_memories_many(self, updates: Dict[str, Dict[str, Any]],
+                             progress: Callable[[int, Optional[int]], None] = None,
+                             updated_at: Dict[str, Dict[str, float]] = None) -> int:
+        """Merge memories into many users' stored memories right away
+
+        Users are written in chunks of flush_batch_size, each read
+        concurrently and added in one document.add call, and progress is
+        called with the users done and the total after every chunk. Updates
+        queued with update_memory are still applied on top when flushed.
+        Returns the number of snapshots written.
+        """
+        user_ids = list(updates)
+        written = 0
+        for start in range(0, len(user_ids), self.flush_batch_size):
+            chunk = user_ids[start:start + self.flush_batch_size]
+            with self._write_lock:
+                written += self._write_changes({user_id: updates[user_id] for user_id in chunk}, updated_at)
+            if progress:
+                progress(start + len(chunk), len(user_ids))
+        return written
+
+    def clear_memories_many(self, user_ids: Iterable[str], progress: Callable[[int, Optional[int]], None] = None):
+        """Clear all memories of many users, deleting concurrently in chunks of flush_batch_size"""
+        user_ids = list(dict.fromkeys(user_ids))
+        for start in range(0, len(user_ids), self.flush_batch_size):
+            chunk = user_ids[start:start + self.flush_batch_size]
+            with self._write_lock:
+                with self._pending_lock:
+                    for user_id in chunk:
+                        self._pending.pop(user_id, None)
+                self._map(self._clear_stored, chunk)
+            if progress:
+                progress(start + len(chunk), len(user_ids))
+
+    def export_jsonl(self, path: str, user_ids: Iterable[str] = None, checkpoint_path: str = None,
+                     progress: Callable[[int, Optional[int]], None] = None) -> int:
+        """Write the memories of user_ids, or of every user, to a JSONL file, one user per line
+
+        Each line is {"user_id", "memories", "updated_at"}. Users are written
+        in chunks of flush_batch_size, and after each one checkpoint_path
+        records how far the export got, so running it again with the same
+        arguments resumes after the last complete chunk (users added since
+        who sort before that point are left out). Returns the number of
+        users written to the file.
+        """
+        self.flush()
+        states = None
+        if user_ids is None:
+            states = {
+                user_id: self._state_from_documents(documents)
+                for user_id, documents in self._read_all_documents().items()
+            }
+            # Sorted so a resumed export can skip users by id, even if new ones appeared since
+            user_ids = sorted(states)
+        else:
+            user_ids = list(dict.fromkeys(user_ids))
+        checkpoint = _read_checkpoint(checkpoint_path)
+        if not os.path.exists(path):
+            checkpoint = {}
+        start = checkpoint.get("done", 0)
+        exported = checkpoint.get("exported", 0)
+        if states is not None and "last_user" in checkpoint:
+            start = bisect.bisect_right(user_ids, checkpoint["last_user"])
+        with open(path, 'r+b' if checkpoint else 'wb') as f:
+            f.seek(checkpoint.get("offset", 0))
+            f.truncate()
+            for start in range(start, len(user_ids), self.flush_batch_size):
+                chunk = user_ids[start:start + self.flush_batch_size]
+                chunk_states = [states[user_id] for user_id in chunk] if states is not None else self._map(self._get_state, chunk)
+                lines = []
+                for user_id, state in zip(chunk, chunk_states):
+                    if state is None:
+                        raise RuntimeError(f"could not read memories for user {user_id}")
+                    lines.append(json.dumps({
+                        "user_id": user_id,
+                        "memories": state["memories"],
+                        "updated_at": state.get("updated_at", {})
+                    }) + "\n")
+                f.write("".join(lines).encode())
+                f.flush()
+                os.fsync(f.fileno())
+                exported += len(lines)
+                _write_checkpoint(checkpoint_path, {
+                    "done": start + len(chunk), "last_user": chunk[-1], "exported": exported, "offset": f.tell()
+                })
+                if progress:
+                    progress(start + len(chunk), len(user_ids))
+        _clear_checkpoint(checkpoint_path)
+        return exported
+
+    def import_jsonl(self, path: str, checkpoint_path: str = None,
+                     progress: Callable[[int, Optional[int]], None] = None) -> int:
+        """Merge the memories in a JSONL file written by export_jsonl into storage
+
+        Lines are imported in chunks of flush_batch_size with
+        update_memories_many, keeping their updated_at times, and after each
+        chunk checkpoint_path records the file offset reached, so running
+        it again resumes after the last complete chunk. Returns the number
+        of lines imported.
+        """
+        checkpoint = _read_checkpoint(checkpoint_path)
+        done = checkpoint.get("done", 0)
+        with open(path, 'rb') as f:
+            f.seek(checkpoint.get("offset", 0))
+            while True:
+                lines = [line for line in itertools.islice(f, self.flush_batch_size) if line.strip()]
+                if not lines:
+                    break
+                updates: Dict[str, Dict[str, Any]] = {}
+                times: Dict[str, Dict[str, float]] = {}
+                for line in lines:
+                    record = json.loads(line)
+                    updates.setdefault(record["user_id"], {}).update(record["memories"])
+                    times.setdefault(record["user_id"], {}).update(record.get("updated_at") or {})
+                self.update_memories_many(updates, updated_at=times)
+                done += len(lines)
+                _write_checkpoint(checkpoint_path, {"done": done, "offset": f.tell()})
+                if progress:
+                    progress(done, None)
+        _clear_checkpoint(checkpoint_path)
+        return done
+
+    def close(self):
+        """Stop the background flusher and write every queued update"""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_event.set()
+        if self._flusher is not None:
+            self._flusher.join()
         try:
-            memories = self.get_memories(user_id)
-            memories[key] = value
-            self.store_memory(user_id, memories)
+            self.flush()
         except Exception as e:
-            print(f"Error updating memory: {e}")
+            unflushed = sum(len(changes) for changes in self._pending.values())
+            print(f"Error flushing memories on shutdown, {unflushed} updates not written: {e}")
             raise
 
     def clear_memories(self, user_id: str):
         """Clear all memories for a user"""
+        with self._write_lock:
+            with self._pending_lock:
+                self._pending.pop(user_id, None)
+            self._clear_stored(user_id)
+
+    def _clear_stored(self, user_id: str):
         try:
-            self.zep_client.document.delete(
+            self._call_zep(
+                "delete",
                 collection_name=self.collection_name,
                 metadata={
-                    "user_id": user_id,
-                    "type": "user_memory"
+                    "user_id": user_id
                 }
             )
         except Exception as e:
             print(f"Error clearing memories: {e}")
-            raise 
\ No newline at end of file
+            self.cache.invalidate(user_id)
+            raise
+        self.cache.set(user_id, self._empty_state())
+
+    def compact_collection(self) -> Dict[str, int]:
+        """Rewrite every user's memories as a single snapshot, removing legacy and stale documents"""
+        self.flush()
+        documents_by_user = self._read_all_documents()
+
+        compacted = 0
+        for user_id, documents in documents_by_user.items():
+            state = self._state_from_documents(documents)
+            if state["legacy"] or state["documents"] > 1:
+                self._write_snapshot(user_id, state, state["memories"], compact=True)
+                compacted += 1
+        return {"users": len(documents_by_user), "compacted": compacted}
+
+    def _read_all_documents(self) -> Dict[str, List[Any]]:
+        """Read every memory document in the collection, grouped by user"""
+        documents_by_user: Dict[str, List[Any]] = {}
+        for document_type in (LEGACY_TYPE, SNAPSHOT_TYPE):
+            search_results = self._call_zep(
+                "search",
+                collection_name=self.collection_name,
+                search_params={"metadata": {"type": document_type}}
+            )
+            for document in search_results:
+                user_id = (document.metadata or {}).get("user_id")
+                if user_id:
+                    documents_by_user.setdefault(user_id, []).append(document)
+        return documents_by_user
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get memory cache hit/miss counters, the number of Zep calls made and queued updates"""
+        stats = self.cache.get_stats()
+        stats["zep_calls"] = self.zep_calls
+        with self._pending_lock:
+            stats["pending_updates"] = sum(len(changes) for changes in self._pending.values())
+        return stats
+
+    async def aget_memories(self, user_id: str) -> Dict[str, Any]:
+        """Async variant of get_memories that keeps the Zep call off the event loop"""
+        return await asyncio.to_thread(self.get_memories, user_id)
+
+    async def aget_relevant_memories(self, user_id: str, query: str) -> Dict[str, Any]:
+        """Async variant of get_relevant_memories"""
+        return await asyncio.to_thread(self.get_relevant_memories, user_id, query)
+
+    async def aupdate_memory(self, user_id: str, key: str, value: Any):
+        """Async variant of update_memory, only queues the update so it never blocks"""
+        self.update_memory(user_id, key, value)
+
+    async def aclear_memories(self, user_id: str):
+        """Async variant of clear_memories"""
+        await asyncio.to_thread(self.clear_memories, user_id)
@@ -0,0 +1,71 @@
+import threading
+import time
+from typing import Any, Dict, Iterable
+
+from conversation_history import estimate_tokens
+from tool_index import ToolIndex
+
+def memory_line(key: str, value: Any) -> str:
+    """Render one memory the way the system prompt lists it"""
+    return f"- {key}: {value}\n"
+
+class MemoryIndex:
+    """BM25 index over one user's memories, kept in sync by re-indexing only what changed"""
+
+    def __init__(self):
+        self.index = ToolIndex()
+        self.values: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def sync(self, memories: Dict[str, Any]):
+        with self._lock:
+            for key in [key for key in self.values if key not in memories]:
+                self.index.remove(key)
+                del self.values[key]
+            for key, value in memories.items():
+                if key not in self.values or self.values[key] != value:
+                    self.index.add(key, f"{key} {value}")
+                    self.values[key] = value
+
+def select_memories(memories: Dict[str, Any], updated_at: Dict[str, float], query: str, top_k: int,
+                    token_budget: int, pinned: Iterable[str] = (), recency_weight: float = 0.3,
+                    half_life: float = 30 * 86400, now: float = None, index: MemoryIndex = None) -> Dict[str, Any]:
+    """Pick the memories worth putting in a prompt about query
+
+    Everything is returned when it already fits within top_k memories and
+    token_budget. Otherwise pinned keys are always kept, and the other
+    memories are ranked by the BM25 relevance of their key and value to the
+    query, relative to the best match, blended with recency_weight of an
+    exponential decay of their age. They're taken best first while they
+    fit, up to top_k of them besides the pinned ones. The result keeps the
+    memories' original order so the prompt stays stable between messages.
+    Passing the user's MemoryIndex from the previous call saves
+    re-indexing memories that didn't change.
+    """
+    costs = {key: estimate_tokens(memory_line(key, value)) for key, value in memories.items()}
+    if len(memories) <= top_k and sum(costs.values()) <= token_budget:
+        return dict(memories)
+
+    chosen = {key for key in pinned if key in memories}
+    budget = token_budget - sum(costs[key] for key in chosen)
+    candidates = [key for key in memories if key not in chosen]
+    index = index or MemoryIndex()
+    index.sync(memories)
+    relevance = index.index.score(query or "", exclude=chosen)
+    best = max(relevance.values(), default=0.0) or 1.0
+    now = time.time() if now is None else now
+
+    def score(key: str) -> float:
+        # Memories with no recorded update time count as old
+        recency = 0.5 ** (max(0.0, now - updated_at.get(key, 0.0)) / half_life)
+        return (1 - recency_weight) * relevance.get(key, 0.0) / best + recency_weight * recency
+
+    taken = 0
+    for key in sorted(candidates, key=score, reverse=True):
+        if taken >= top_k:
+            break
+        if costs[key] <= budget:
+            chosen.add(key)
+            budget -= costs[key]
+            taken += 1
+    return {key: value for key, value in memories.items() if key in chosen}
@@ -0,0 +1,170 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Tuple
+
+# Upper bounds, in seconds, of the histogram buckets used for latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Observations that aren't latencies get buckets of their own
+BUCKETS = {
+    "agent_iterations": (1, 2, 3, 4, 5, 7, 10),
+    "completion_tokens": (16, 64, 128, 256, 512, 1024, 2048, 4096),
+    "prompt_tokens": (256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+}
+
+class Metrics:
+    """Process-wide counters, gauges and histograms, labelled by keyword arguments"""
+
+    def __init__(self):
+        self.counters: Dict[Tuple, float] = {}
+        self.gauges: Dict[Tuple, float] = {}
+        self.observations: Dict[Tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add value to a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Set a value that can go up and down, such as a queue depth"""
+        key = self._key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one observation, such as a latency in seconds, in a histogram"""
+        key = self._key(name, labels)
+        bounds = BUCKETS.get(name, LATENCY_BUCKETS)
+        with self._lock:
+            summary = self.observations.get(key)
+            if summary is None:
+                summary = self.observations[key] = {
+                    "count": 0, "sum": 0.0, "max": 0.0, "bounds": bounds, "buckets": [0] * (len(bounds) + 1)
+                }
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["max"] = max(summary["max"], value)
+            summary["buckets"][bisect.bisect_left(bounds, value)] += 1
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """Time the block as one stage of handling a request, in stage_seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage, **labels)
+
+    @staticmethod
+    def quantile(summary: Dict[str, Any], q: float) -> float:
+        """Estimate a quantile of a histogram by interpolating inside the bucket it falls in"""
+        if not summary["count"]:
+            return 0.0
+        rank = q * summary["count"]
+        seen = 0
+        for i, count in enumerate(summary["buckets"]):
+            if count and seen + count >= rank:
+                lower = summary["bounds"][i - 1] if i > 0 else 0.0
+                upper = summary["bounds"][i] if i < len(summary["bounds"]) else summary["max"]
+                return min(lower + (upper - lower) * (rank - seen) / count, summary["max"])
+            seen += count
+        return summary["max"]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get a copy of every counter and gauge, and count, sum, max and p50/p95/p99 of every histogram"""
+        def label(key: Tuple) -> str:
+            name, labels = key
+            if not labels:
+                return name
+            return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+        with self._lock:
+            return {
+                "counters": {label(key): value for key, value in self.counters.items()},
+                "gauges": {label(key): value for key, value in self.gauges.items()},
+                "observations": {
+                    label(key): {
+                        "count": summary["count"],
+                        "sum": summary["sum"],
+                        "max": summary["max"],
+                        "p50": self.quantile(summary, 0.5),
+                        "p95": self.quantile(summary, 0.95),
+                        "p99": self.quantile(summary, 0.99)
+                    }
+                    for key, summary in self.observations.items()
+                }
+            }
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        def labels_text(labels: Tuple, *extra: Tuple[str, str]) -> str:
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        def number(value: float) -> str:
+            return "+Inf" if value == math.inf else repr(float(value))
+
+        lines = []
+        typed = set()
+        with self._lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for (name, labels), value in sorted(values.items()):
+                    if name not in typed:
+                        typed.add(name)
+                        lines.append(f"# TYPE {name} {kind}")
+                    lines.append(f"{name}{labels_text(labels)} {number(value)}")
+            for (name, labels), summary in sorted(self.observations.items(), key=lambda item: item[0]):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} histogram")
+                cumulative = 0
+                for bound, count in zip((*summary["bounds"], math.inf), summary["buckets"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{labels_text(labels, ('le', number(bound)))} {cumulative}")
+                lines.append(f"{name}_sum{labels_text(labels)} {number(summary['sum'])}")
+                lines.append(f"{name}_count{labels_text(labels)} {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Drop every recorded value"""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.observations.clear()
+
+metrics = Metrics()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve this process's metrics at http://host:port/metrics from a background thread"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -0,0 +1,98 @@
+import json
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from conversation_history import estimate_tokens
+from tool_index import tokenize
+
+# Dollars per million prompt and completion tokens, overridable with MODEL_PRICES
+MODEL_PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "meta-llama/llama-4-scout-17b-16e-instruct": (0.11, 0.34),
+    "meta-llama/llama-4-maverick-17b-128e-instruct": (0.20, 0.60),
+    "llama-3.3-70b-versatile": (0.59, 0.79)
+}
+
+# Words and phrases, in English and Portuguese, that suggest a message needs more than small talk
+REASONING_WORDS = {
+    "why", "explain", "compare", "calculate", "prove", "analyze", "analyse", "debug", "plan", "code",
+    "porque", "explique", "explica", "calcule", "analise", "depure", "planeje", "código"
+}
+REASONING_PHRASES = ("```", "step by step", "por que", "passo a passo")
+
+# Common English and Portuguese words left out when matching a message against tools
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "for", "from", "how", "i", "if", "in",
+    "is", "it", "me", "my", "of", "on", "or", "so", "that", "the", "this", "to", "was", "what", "with", "you",
+    "your", "o", "os", "um", "uma", "e", "é", "de", "da", "dos", "das", "em", "no", "na", "nos",
+    "nas", "para", "pra", "por", "com", "que", "se", "eu", "meu", "minha", "você", "voce", "tudo", "bem",
+    "oi", "olá", "ola", "hi", "hello", "hey", "thanks", "obrigado", "obrigada"
+}
+
+def load_prices(raw: str = None) -> Dict[str, Tuple[float, float]]:
+    """Get the price table, with models from a JSON object like {"model": [input, output]} added or replaced"""
+    prices = dict(MODEL_PRICES)
+    if raw:
+        try:
+            prices.update({model: (float(price[0]), float(price[1])) for model, price in json.loads(raw).items()})
+        except Exception as e:
+            print(f"Error parsing MODEL_PRICES: {e}")
+    return prices
+
+class ModelRouter:
+    """Pick the model for a message: the small one for simple chat, the large one when tools or reasoning are needed"""
+
+    def __init__(self, large_model: str, small_model: str = None, max_simple_tokens: int = 64,
+                 tool_score: float = 1.0):
+        self.large_model = large_model
+        self.small_model = small_model
+        self.max_simple_tokens = max_simple_tokens
+        self.tool_score = tool_score
+
+    def route(self, message: str, score_tools: Callable[[str], Dict[str, float]]) -> Tuple[str, str]:
+        """Get the model for message and the reason it was picked
+
+        score_tools gives the BM25 relevance of the tools to a query. Any
+        tool scoring at least tool_score for the message's words other than
+        STOPWORDS, which takes sharing a word few tools use, sends it to the
+        large model, as do long messages and ones asking for reasoning or code.
+        """
+        if not self.small_model or self.small_model == self.large_model:
+            return self.large_model, "single"
+        if estimate_tokens(message) > self.max_simple_tokens:
+            return self.large_model, "long"
+        lowered = message.lower()
+        words = [word for word in tokenize(lowered) if word not in STOPWORDS]
+        if any(phrase in lowered for phrase in REASONING_PHRASES) or REASONING_WORDS.intersection(words):
+            return self.large_model, "reasoning"
+        if words and any(score >= self.tool_score for score in score_tools(" ".join(words)).values()):
+            return self.large_model, "tools"
+        return self.small_model, "simple"
+
+class RequestBudget:
+    """Wall-clock and token allowance for answering one message, 0 meaning unlimited"""
+
+    def __init__(self, seconds: float = 0, tokens: int = 0):
+        self.start = time.perf_counter()
+        self.seconds = seconds
+        self.tokens = tokens
+        self.used_tokens = 0
+
+    def add(self, tokens: int):
+        self.used_tokens += tokens
+
+    def exceeded(self) -> Optional[str]:
+        """Get which allowance ran out, if any"""
+        if self.seconds and time.perf_counter() - self.start >= self.seconds:
+            return "latency_budget"
+        if self.tokens and self.used_tokens >= self.tokens:
+            return "token_budget"
+        return None
+
+def tool_call_key(name: str, arguments: str) -> Tuple[str, str]:
+    """Identify a tool call by its name and arguments, ignoring key order and whitespace"""
+    try:
+        arguments = json.dumps(json.loads(arguments), sort_keys=True)
+    except (TypeError, ValueError):
+        pass
+    return name, arguments
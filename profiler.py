@@ -0,0 +1,87 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict
+
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class SlowRequestProfiler:
+    """Samples the stack of the thread handling a request and logs it if the request is slow
+
+    Disabled unless PROFILE_SLOW_SECONDS is set. While at least one request
+    is being profiled, a background thread records the stack of each
+    request's thread every `interval` seconds. Requests on the event loop
+    share its thread, so a slow request's profile also includes whatever
+    other requests ran on the loop meanwhile; time spent waiting on the
+    network shows up as the loop's select call.
+    """
+
+    def __init__(self, threshold: float = None, interval: float = None, top: int = 10):
+        self.threshold = threshold if threshold is not None else float(os.getenv("PROFILE_SLOW_SECONDS", "0"))
+        self.interval = interval or float(os.getenv("PROFILE_INTERVAL", "0.005"))
+        self.top = top
+        self._active: Dict[int, tuple] = {}
+        self._lock = threading.Lock()
+        self._sampler: threading.Thread = None
+
+    @contextmanager
+    def profile(self, name: str):
+        """Profile the block, logging its hottest stacks if it takes threshold seconds or more"""
+        if not self.threshold:
+            yield
+            return
+        samples = Counter()
+        token = object()
+        with self._lock:
+            self._active[id(token)] = (threading.get_ident(), samples)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name="slow-request-profiler", daemon=True)
+                self._sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                del self._active[id(token)]
+            if elapsed >= self.threshold:
+                self._report(name, elapsed, samples)
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                active = list(self._active.values())
+            frames = sys._current_frames()
+            for thread_id, samples in active:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[self._stack(frame)] += 1
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _stack(frame) -> str:
+        """Collapse a stack into "file:function:line" frames, outermost first, separated by semicolons"""
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def _report(self, name: str, elapsed: float, samples: Counter):
+        metrics.increment("slow_requests_total", stage=name)
+        total = sum(samples.values())
+        lines = [f"Slow {name}: {elapsed:.2f}s, {total} samples"]
+        for stack, count in samples.most_common(self.top):
+            # The innermost frames say the most, keep the tail of long stacks
+            lines.append(f"  {count / total:6.1%}  {stack[-400:]}")
+        logger.warning("\n".join(lines))
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict
+
+from ttl_cache import TTLCache
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Two-tier cache for tool results and completions
+
+    Entries live in a bounded in-memory LRU and, when a path is given, in a
+    SQLite file that survives restarts. Each entry carries its own TTL.
+    Values read from disk are copied into memory for the rest of their
+    lifetime. Values must be JSON-serializable.
+    """
+
+    def __init__(self, name: str, max_size: int, default_ttl: float, path: str = None, max_disk_entries: int = 100000):
+        self.name = name
+        self.default_ttl = default_ttl
+        self.memory = TTLCache(max_size=max_size, ttl=default_ttl)
+        self.max_disk_entries = max_disk_entries
+        self.lookups = 0
+        self.disk_hits = 0
+        self._writes = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Hash parts into a key, canonicalizing dicts so argument order doesn't matter"""
+        canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired in both tiers"""
+        self.lookups += 1
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self._db is None:
+            return default
+        with self._db_lock:
+            row = self._db.execute(f"SELECT value, expires_at FROM {self.name} WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return default
+        value = json.loads(row[0])
+        self.disk_hits += 1
+        self.memory.set(key, value, ttl=row[1] - time.time())
+        return value
+
+    def set(self, key: str, value: Any, ttl: float = None):
+        """Store a value in both tiers for ttl seconds"""
+        ttl = self.default_ttl if ttl is None else ttl
+        self.memory.set(key, value, ttl=ttl)
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.name} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._prune()
+
+    def _prune(self):
+        """Drop expired rows, then the ones closest to expiry beyond max_disk_entries"""
+        self._db.execute(f"DELETE FROM {self.name} WHERE expires_at <= ?", (time.time(),))
+        self._db.execute(
+            f"DELETE FROM {self.name} WHERE key IN "
+            f"(SELECT key FROM {self.name} ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,)
+        )
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        self.memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(f"DELETE FROM {self.name}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get lookups, hits per tier and the overall hit ratio"""
+        memory_stats = self.memory.get_stats()
+        hits = memory_stats["hits"] + self.disk_hits
+        return {
+            "lookups": self.lookups,
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": self.disk_hits,
+            "hit_ratio": hits / self.lookups if self.lookups else 0.0,
+            "size": memory_stats["size"],
+            "max_size": memory_stats["max_size"]
+        }
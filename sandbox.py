@@ -0,0 +1,162 @@
+import ast
+import atexit
+import json
+import os
+import queue
+import select
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from typing import Any, Dict
+
+from metrics import metrics
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+
+class SandboxError(Exception):
+    """Raised when agent-authored tool code fails, times out or kills its worker"""
+
+
+def validate_tool_code(code: str):
+    """Check that tool code parses and defines a top-level run function, without running it"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise ValueError(f"Tool code has a syntax error: {e}")
+    if not any(isinstance(node, ast.FunctionDef) and node.name == "run" for node in tree.body):
+        raise ValueError("Tool code must define a function run(**arguments)")
+
+
+class SandboxWorker:
+    """One worker subprocess and the line-based JSON pipe to it"""
+
+    def __init__(self, cpu_seconds: float, memory_mb: int, max_calls: int, workdir: str):
+        self.process = subprocess.Popen(
+            [sys.executable, "-I", WORKER_PATH, str(cpu_seconds), str(memory_mb), str(max_calls)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            cwd=workdir,
+            # Tool code only sees the secrets passed to it as env_var arguments
+            env={"PATH": os.defpath}
+        )
+        self.calls = 0
+
+    def call(self, code: str, arguments: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        self.calls += 1
+        try:
+            self.process.stdin.write(json.dumps({"code": code, "arguments": arguments}).encode() + b"\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError):
+            raise SandboxError(self._exit_reason())
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            raise TimeoutError
+        line = self.process.stdout.readline()
+        if not line:
+            raise SandboxError(self._exit_reason())
+        return json.loads(line)
+
+    def _exit_reason(self) -> str:
+        try:
+            code = self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            return "tool worker stopped responding"
+        if code == -signal.SIGXCPU:
+            return "tool code exceeded its CPU time limit"
+        return f"tool worker exited with code {code}"
+
+    def kill(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class SandboxPool:
+    """Pre-started worker subprocesses that run agent-authored tool code
+
+    Workers are started together by start() (or the first call) and reused
+    across calls, so a call doesn't pay for interpreter startup. Each worker limits its own
+    CPU time per call and its address space. The pool enforces the
+    wall-clock timeout. A worker that times out, crashes or reaches
+    max_calls is killed and replaced right away. These are resource limits,
+    not a security boundary: tool code can still read files and open
+    sockets as the bot's user.
+    """
+
+    def __init__(self, size: int = None, cpu_seconds: float = None, memory_mb: int = None,
+                 timeout: float = None, max_calls: int = None):
+        self.size = size or int(os.getenv("SANDBOX_WORKERS", "2"))
+        self.cpu_seconds = cpu_seconds or float(os.getenv("SANDBOX_CPU_SECONDS", "5"))
+        self.memory_mb = memory_mb or int(os.getenv("SANDBOX_MEMORY_MB", "256"))
+        self.timeout = timeout or float(os.getenv("SANDBOX_TIMEOUT", "10"))
+        self.max_calls = max_calls or int(os.getenv("SANDBOX_MAX_CALLS", "500"))
+        self._idle: "queue.Queue[SandboxWorker]" = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._workdir = None
+        self._started = False
+        self._closed = False
+
+    def start(self):
+        """Start every worker, if that hasn't happened yet"""
+        with self._lock:
+            if self._started:
+                return
+            if self._closed:
+                raise SandboxError("sandbox pool is closed")
+            self._workdir = tempfile.mkdtemp(prefix="tool-sandbox-")
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+            self._started = True
+            atexit.register(self.close)
+
+    def _spawn(self) -> SandboxWorker:
+        worker = SandboxWorker(self.cpu_seconds, self.memory_mb, self.max_calls, self._workdir)
+        self._workers.add(worker)
+        metrics.increment("sandbox_workers_started_total")
+        return worker
+
+    def _replace(self, worker: SandboxWorker):
+        worker.kill()
+        with self._lock:
+            self._workers.discard(worker)
+            if not self._closed:
+                self._idle.put(self._spawn())
+
+    def run(self, code: str, arguments: Dict[str, Any], timeout: float = None) -> Any:
+        """Run tool code's run(**arguments) in a worker and return its result, blocking until done"""
+        self.start()
+        timeout = timeout or self.timeout
+        worker = self._idle.get()
+        reusable = False
+        try:
+            response = worker.call(code, arguments, timeout)
+            reusable = worker.calls < self.max_calls
+        except TimeoutError:
+            metrics.increment("sandbox_timeouts_total")
+            raise SandboxError(f"tool code timed out after {timeout} seconds")
+        finally:
+            if reusable:
+                self._idle.put(worker)
+            else:
+                self._replace(worker)
+        if not response["ok"]:
+            raise SandboxError(response["error"])
+        return response["result"]
+
+    def close(self):
+        """Kill every worker"""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, set()
+        for worker in workers:
+            worker.kill()
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir, ignore_errors=True)
@@ -0,0 +1,77 @@
+"""Worker process that runs agent-authored tool code for sandbox.SandboxPool
+
+Usage: python -I sandbox_worker.py <cpu seconds per call> <memory MB> <max calls>
+
+Reads one JSON request per line from stdin, {"code": ..., "arguments": {...}},
+and writes one JSON response per line to stdout, {"ok": true, "result": ...}
+or {"ok": false, "error": ...}. Anything the tool code prints is discarded.
+"""
+import contextlib
+import io
+import json
+import resource
+import sys
+
+# Compiled run functions by source, so repeated calls skip exec
+_MAX_COMPILED = 64
+
+
+def set_limits(cpu_seconds: float, memory_mb: int, max_calls: int):
+    memory = memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    # The hard CPU limit covers the worker's whole life, the soft one is moved per call
+    lifetime = int(cpu_seconds * max_calls) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (lifetime, lifetime))
+
+
+def cpu_time_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def load_run(code: str, compiled: dict):
+    run = compiled.get(code)
+    if run is None:
+        namespace = {"__name__": "tool"}
+        exec(compile(code, "<tool>", "exec"), namespace)
+        run = namespace.get("run")
+        if not callable(run):
+            raise ValueError("tool code must define a function run(**arguments)")
+        if len(compiled) >= _MAX_COMPILED:
+            compiled.clear()
+        compiled[code] = run
+    return run
+
+
+def handle(request: dict, compiled: dict, cpu_seconds: float) -> dict:
+    # Going over the soft limit raises SIGXCPU, which kills the worker
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    resource.setrlimit(resource.RLIMIT_CPU, (min(int(cpu_time_used() + cpu_seconds) + 1, hard), hard))
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = load_run(request["code"], compiled)(**request["arguments"])
+        try:
+            json.dumps(result)
+        except (TypeError, ValueError):
+            result = str(result)
+        return {"ok": True, "result": result}
+    except MemoryError:
+        return {"ok": False, "error": "memory limit exceeded"}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def main():
+    cpu_seconds, memory_mb, max_calls = float(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3])
+    set_limits(cpu_seconds, memory_mb, max_calls)
+    protocol = sys.stdout
+    compiled = {}
+    for line in sys.stdin:
+        response = handle(json.loads(line), compiled, cpu_seconds)
+        protocol.write(json.dumps(response) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
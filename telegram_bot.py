@@ -1,9 +1,20 @@
 import os
+import time
+import signal
+import asyncio
 import logging
-from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from typing import List
+from telegram import Update, Message
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, ContextTypes
 from groq_agent import GroqAgent
-from dotenv import load_dotenv
+from webhook_server import ChatRouter, WebhookServer
+from worker_pool import ShardedWorkerPool
+from chat_queue import ChatQueue
+from metrics import metrics, start_metrics_server
+from profiler import SlowRequestProfiler
+from transport import CircuitOpenError
+from config import load_env
 
 # Configure logging
 logging.basicConfig(
@@ -13,14 +24,117 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+# Only plain messages carry the text and commands the handlers below react to
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split text into chunks Telegram accepts, preferring to break at newlines"""
+    chunks = []
+    text = text or ""
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
+
+class StreamingReply:
+    """Shows a streamed response by progressively editing reply messages
+
+    Edits are throttled to one per edit_interval seconds, and text past the
+    4096 character limit continues in a new message.
+    """
+
+    def __init__(self, message: Message, edit_interval: float):
+        self.message = message
+        self.edit_interval = edit_interval
+        self.text = ""
+        self._sent: List[Message] = []
+        self._sent_texts: List[str] = []
+        self._next_edit = 0.0
+
+    async def add(self, token: str):
+        """Append a token, pushing the text to Telegram if the throttle allows"""
+        self.text += token
+        if time.monotonic() >= self._next_edit:
+            await self.flush()
+
+    async def finish(self, text: str):
+        """Replace the streamed text with the final response and push it"""
+        self.text = text
+        await self.flush(final=True)
+
+    async def flush(self, final: bool = False):
+        """Send or edit messages so Telegram shows the current text"""
+        self._next_edit = time.monotonic() + self.edit_interval
+        chunks = [chunk for chunk in split_message(self.text) if chunk.strip()]
+        try:
+            for i, chunk in enumerate(chunks):
+                if i < len(self._sent):
+                    if self._sent_texts[i] != chunk:
+                        await self._sent[i].edit_text(chunk)
+                        self._sent_texts[i] = chunk
+                else:
+                    self._sent.append(await self.message.reply_text(chunk))
+                    self._sent_texts.append(chunk)
+            if final:
+                # The final text can be shorter than what was streamed, drop the messages it no longer fills
+                while len(self._sent) > len(chunks):
+                    await self._sent[-1].delete()
+                    self._sent.pop()
+                    self._sent_texts.pop()
+        except RetryAfter as e:
+            if final:
+                await asyncio.sleep(e.retry_after)
+                await self.flush(final=True)
+                return
+            # Flood control, hold further edits until Telegram allows them again
+            self._next_edit = time.monotonic() + e.retry_after
+        except BadRequest as e:
+            logger.warning(f"Could not update streamed reply: {e}")
 
 class TelegramBot:
-    def __init__(self):
-        self.agent = GroqAgent()
+    def __init__(self, agent: GroqAgent = None):
+        # With worker processes this process only routes updates, each worker runs its own agent
+        self.worker_processes = int(os.getenv("WORKER_PROCESSES", "0"))
+        self.worker_pool = ShardedWorkerPool(self.worker_processes) if self.worker_processes else None
+        if agent is None and self.worker_pool is None:
+            agent = GroqAgent()
+        self.agent = agent
         self.token = os.getenv("TELEGRAM_BOT_TOKEN")
         if not self.token:
             raise ValueError("TELEGRAM_BOT_TOKEN not found in environment variables")
+        # Maximum number of updates handled concurrently by this process
+        self.max_concurrent_updates = int(os.getenv("MAX_CONCURRENT_UPDATES", "32"))
+        # Stream responses by editing the reply as tokens arrive
+        self.stream_responses = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+        self.stream_edit_interval = float(os.getenv("STREAM_EDIT_INTERVAL", "1.0"))
+        self.api_base_url = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
+        # "polling" or "webhook"
+        self.mode = os.getenv("BOT_MODE", "polling")
+        self.webhook_url = os.getenv("WEBHOOK_URL")
+        self.webhook_listen = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+        self.webhook_port = int(os.getenv("WEBHOOK_PORT", "8443"))
+        self.webhook_path = os.getenv("WEBHOOK_PATH", "/telegram")
+        self.webhook_secret_token = os.getenv("WEBHOOK_SECRET_TOKEN")
+        self.webhook_lanes = int(os.getenv("WEBHOOK_LANES", str(self.max_concurrent_updates)))
+        # Messages waiting or running across all chats before new ones get a "busy" reply
+        self.chat_queue = ChatQueue(max_pending=int(os.getenv("MAX_PENDING_MESSAGES", "200")))
+        self._chat_tasks = set()
+        # Agent runs in flight at once, created inside the running event loop
+        self._run_slots = None
+        # Prometheus endpoint, 0 disables it; worker processes use the ports right after it
+        self.metrics_port = int(os.getenv("METRICS_PORT", "0"))
+        self.metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+        self.profiler = SlowRequestProfiler()
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send a message when the command /start is issued."""
@@ -33,7 +147,7 @@ class TelegramBot:
         await update.message.reply_text(welcome_message)
         
         # Store initial user preference
-        self.agent.update_user_memory(user_id, "language", "pt-BR")
+        await self.agent.aupdate_user_memory(user_id, "language", "pt-BR")
 
     async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Send a message when the command /help is issued."""
@@ -62,12 +176,13 @@ class TelegramBot:
             tools_text += f"  Criado em: {tool['created_at']}\n"
             tools_text += f"  Última modificação: {tool['last_modified']}\n\n"
 
-        await update.message.reply_text(tools_text)
+        for chunk in split_message(tools_text):
+            await update.message.reply_text(chunk)
 
     async def show_memory(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show user's stored memories."""
         user_id = str(update.effective_user.id)
-        memories = self.agent.memory_manager.get_memories(user_id)
+        memories = await self.agent.memory_manager.aget_memories(user_id)
         
         if not memories:
             await update.message.reply_text("Você ainda não tem memórias armazenadas.")
@@ -77,47 +192,222 @@ class TelegramBot:
         for key, value in memories.items():
             memory_text += f"• {key}: {value}\n"
 
-        await update.message.reply_text(memory_text)
+        for chunk in split_message(memory_text):
+            await update.message.reply_text(chunk)
 
     async def clear_memory(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Clear user's stored memories."""
         user_id = str(update.effective_user.id)
-        self.agent.memory_manager.clear_memories(user_id)
+        await self.agent.clear_user(user_id)
         await update.message.reply_text("✅ Suas memórias foram limpas com sucesso!")
 
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle incoming messages."""
         user_id = str(update.effective_user.id)
-        message_text = update.message.text
 
-        # Send "typing" action
-        await update.message.chat.send_action(action="typing")
+        # Queue the message behind any run already in flight for this chat
+        started = self.chat_queue.put(user_id, (update, time.perf_counter()))
+        if started is None:
+            metrics.increment("messages_shed_total")
+            await update.message.reply_text(
+                "⏳ Estou recebendo muitas mensagens agora. Por favor, tente novamente em instantes."
+            )
+            return
+        metrics.set_gauge("chat_queue_size", self.chat_queue.size)
+        if started:
+            task = asyncio.create_task(self._drain_chat(user_id))
+            self._chat_tasks.add(task)
+            task.add_done_callback(self._chat_tasks.discard)
+
+    async def _drain_chat(self, user_id: str):
+        """Answer a chat's queued messages until none are left, merging those that arrived together"""
+        if self._run_slots is None:
+            self._run_slots = asyncio.Semaphore(self.max_concurrent_updates)
+        try:
+            while True:
+                batch = self.chat_queue.take(user_id)
+                if not batch:
+                    return
+                try:
+                    async with self._run_slots:
+                        metrics.observe("queue_wait_seconds", time.perf_counter() - batch[0][1])
+                        if len(batch) > 1:
+                            metrics.increment("messages_coalesced_total", len(batch) - 1)
+                        update = batch[-1][0]
+                        message_text = "\n\n".join(queued.message.text for queued, _ in batch)
+                        start = time.perf_counter()
+                        await self._respond(update, user_id, message_text)
+                        metrics.observe("processing_seconds", time.perf_counter() - start)
+                except Exception as e:
+                    # Even the error reply failed, move on to whatever is queued next
+                    logger.error(f"Error answering chat {user_id}: {e}")
+                finally:
+                    self.chat_queue.done(len(batch))
+                    metrics.set_gauge("chat_queue_size", self.chat_queue.size)
+        finally:
+            # A cancelled runner must not leave the chat marked as busy
+            if self.chat_queue.release(user_id):
+                metrics.set_gauge("chat_queue_size", self.chat_queue.size)
+
+    async def _respond(self, update: Update, user_id: str, message_text: str):
+        """Run the agent on a message and reply to update with the response."""
+        # Keep the "typing" action alive through streaming and tool rounds, until the reply is sent
+        typing_task = asyncio.create_task(self._keep_typing(update))
 
         try:
-            # Process message with Groq agent
-            response = self.agent.process_message(user_id, message_text)
-            await update.message.reply_text(response)
+            with self.profiler.profile("respond"), metrics.span("respond"):
+                # Process message with Groq agent
+                if self.stream_responses:
+                    reply = StreamingReply(update.message, self.stream_edit_interval)
+
+                    response = await self.agent.aprocess_message(user_id, message_text, on_token=reply.add)
+                    with metrics.span("reply"):
+                        await reply.finish(response)
+                else:
+                    response = await self.agent.aprocess_message(user_id, message_text)
+                    with metrics.span("reply"):
+                        for chunk in split_message(response):
+                            await update.message.reply_text(chunk)
+        except CircuitOpenError as e:
+            logger.warning(f"Failing fast: {e}")
+            await update.message.reply_text(
+                "⚠️ O serviço de IA está instável no momento. Por favor, tente novamente em alguns instantes."
+            )
         except Exception as e:
             logger.error(f"Error processing message: {e}")
             await update.message.reply_text(
                 "Desculpe, ocorreu um erro ao processar sua mensagem. Por favor, tente novamente."
             )
+        finally:
+            typing_task.cancel()
 
-    def run(self):
-        """Start the bot."""
-        # Create the Application
-        application = Application.builder().token(self.token).build()
+    async def _keep_typing(self, update: Update):
+        """Resend the "typing" action before Telegram expires it, while tools run"""
+        try:
+            while True:
+                await update.message.chat.send_action(action="typing")
+                await asyncio.sleep(4)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"Could not send typing action: {e}")
+
+    async def dispatch_to_worker(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Hand an update to the worker process that owns its user."""
+        self.worker_pool.submit(update.to_dict())
+
+    async def drain_chats(self, application: Application = None):
+        """Wait for the runs already answering chats, while the bot can still send their replies."""
+        while self._chat_tasks:
+            await asyncio.gather(*self._chat_tasks, return_exceptions=True)
+
+    async def shutdown(self, application: Application):
+        """Drain worker processes and flush queued memory updates before the process exits."""
+        if self.worker_pool is not None:
+            await asyncio.to_thread(self.worker_pool.stop)
+        if self.agent is not None:
+            await asyncio.to_thread(self.agent.memory_manager.close)
+
+    def build_application(self) -> Application:
+        """Create the Application with every handler registered."""
+        application = (
+            Application.builder()
+            .token(self.token)
+            .base_url(self.api_base_url)
+            # Dispatching to workers is instant and must keep the arrival order
+            .concurrent_updates(False if self.worker_pool else self.max_concurrent_updates)
+            # Runs are started outside the Application, so stopping it doesn't wait for them
+            .post_stop(self.drain_chats)
+            .post_shutdown(self.shutdown)
+            .build()
+        )
+
+        if self.worker_pool is not None:
+            application.add_handler(TypeHandler(Update, self.dispatch_to_worker))
+            return application
 
         # Add handlers
-        application.add_handler(CommandHandler("start", self.start))
-        application.add_handler(CommandHandler("help", self.help))
-        application.add_handler(CommandHandler("tools", self.list_tools))
-        application.add_handler(CommandHandler("memory", self.show_memory))
-        application.add_handler(CommandHandler("clear", self.clear_memory))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
+        application.add_handler(CommandHandler("start", self._timed("start", self.start)))
+        application.add_handler(CommandHandler("help", self._timed("help", self.help)))
+        application.add_handler(CommandHandler("tools", self._timed("tools", self.list_tools)))
+        application.add_handler(CommandHandler("memory", self._timed("memory", self.show_memory)))
+        application.add_handler(CommandHandler("clear", self._timed("clear", self.clear_memory)))
+        application.add_handler(
+            MessageHandler(filters.TEXT & ~filters.COMMAND, self._timed("message", self.handle_message))
+        )
+        return application
+
+    def _timed(self, name: str, handler):
+        """Wrap a handler so its duration is recorded as the handler stage"""
+        async def timed(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            with metrics.span("handler", handler=name):
+                await handler(update, context)
+        return timed
+
+    def start_metrics_server(self, offset: int = 0):
+        """Serve this process's metrics on METRICS_PORT + offset, if METRICS_PORT is set"""
+        if self.metrics_port:
+            start_metrics_server(self.metrics_port + offset, self.metrics_host)
+
+    def run(self):
+        """Start the bot."""
+        application = self.build_application()
+        self.start_metrics_server()
+        if self.worker_pool is not None:
+            self.worker_pool.start()
 
         # Start the bot
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if self.mode == "webhook":
+            asyncio.run(self.run_webhook(application))
+        else:
+            application.run_polling(allowed_updates=ALLOWED_UPDATES)
+
+    async def run_webhook(self, application: Application, stop_event: asyncio.Event = None):
+        """Serve updates from the local webhook server until stop_event is set or the process is signalled."""
+        async def process(update_data):
+            if self.worker_pool is not None:
+                self.worker_pool.submit(update_data)
+            else:
+                await application.process_update(Update.de_json(update_data, application.bot))
+
+        router = ChatRouter(process, lanes=1 if self.worker_pool else self.webhook_lanes)
+        server = WebhookServer(
+            router,
+            host=self.webhook_listen,
+            port=self.webhook_port,
+            path=self.webhook_path,
+            secret_token=self.webhook_secret_token
+        )
+
+        stop_event = stop_event or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                # Not available on Windows or outside the main thread
+                pass
+
+        await application.initialize()
+        await application.start()
+        router.start()
+        await server.start()
+        try:
+            if self.webhook_url:
+                await application.bot.set_webhook(
+                    url=self.webhook_url.rstrip("/") + self.webhook_path,
+                    allowed_updates=ALLOWED_UPDATES,
+                    secret_token=self.webhook_secret_token
+                )
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            # post_stop doesn't run here either, the runs must finish while the bot can still reply
+            await self.drain_chats(application)
+            await application.stop()
+            await application.shutdown()
+            # post_shutdown only runs on its own under run_polling/run_webhook
+            await self.shutdown(application)
 
 if __name__ == "__main__":
     try:
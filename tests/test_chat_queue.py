@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeTelegramApi, FakeTelegramMessage, fake_update
+from chat_queue import ChatQueue
+
+
+class BrokenTelegramMessage(FakeTelegramMessage):
+    """A message whose replies all fail, like when Telegram is unreachable"""
+
+    async def reply_text(self, text: str, **kwargs):
+        await self.api.call("sendMessage")
+        raise RuntimeError("Telegram is unreachable")
+
+
+def test_release_frees_the_chat_and_its_capacity():
+    queue = ChatQueue(max_pending=3)
+    assert queue.put("1", "a") is True
+    assert queue.put("1", "b") is False
+    assert queue.release("1") == 2
+    assert queue.size == 0
+    assert queue.put("1", "c") is True
+
+
+def test_failed_reply_does_not_leave_the_chat_busy(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "1:test")
+    monkeypatch.setenv("STREAM_RESPONSES", "false")
+    from telegram_bot import TelegramBot
+
+    async def aprocess_message(user_id: str, message_text: str, on_token=None):
+        raise RuntimeError("Groq is down")
+
+    bot = TelegramBot(agent=SimpleNamespace(aprocess_message=aprocess_message))
+    api = FakeTelegramApi()
+
+    async def run():
+        update = fake_update(api, 1, "oi")
+        update.message = BrokenTelegramMessage(api, 1, "oi")
+        await bot.handle_message(update, None)
+        await asyncio.gather(*bot._chat_tasks)
+        # The next message from the chat starts a new run and gets answered
+        update = fake_update(api, 1, "oi de novo")
+        await bot.handle_message(update, None)
+        await asyncio.gather(*bot._chat_tasks)
+        return update
+
+    update = asyncio.run(run())
+    assert bot.chat_queue.size == 0
+    assert [reply.text for reply in update.message.replies] == [
+        "Desculpe, ocorreu um erro ao processar sua mensagem. Por favor, tente novamente."
+    ]
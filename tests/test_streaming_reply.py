@@ -0,0 +1,25 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeTelegramApi, FakeTelegramMessage
+
+
+def test_final_text_shorter_than_the_stream_deletes_the_extra_messages(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "1:test")
+    from telegram_bot import StreamingReply
+
+    message = FakeTelegramMessage(FakeTelegramApi(), 1, "oi")
+    reply = StreamingReply(message, edit_interval=0)
+
+    async def run():
+        # A long streamed draft spills into a second message, the final answer fits in one
+        await reply.add("a" * 5000)
+        await reply.finish("short answer")
+
+    asyncio.run(run())
+    assert [sent.text for sent in message.replies] == ["short answer", "a" * 904]
+    assert [sent.deleted for sent in message.replies] == [False, True]
+    assert reply._sent == message.replies[:1]
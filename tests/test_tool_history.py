@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_history import ToolHistory
+
+
+def make_tool(description: str):
+    return {"name": "weather", "description": description, "parameters": {"type": "object", "properties": {}}}
+
+
+def test_torn_last_line_is_dropped_before_the_next_append(tmp_path):
+    path = str(tmp_path / "tools_config.history")
+    history = ToolHistory(path)
+    history.load()
+    history.record("weather", "create", make_tool("v1"))
+    history.record("weather", "edit", make_tool("v2"))
+    # A crash in the middle of an append leaves half a line and no newline
+    with open(path, "a") as f:
+        f.write('{"tool": "weather", "version": 3, "op": "ed')
+
+    history = ToolHistory(path)
+    history.load()
+    assert history.record("weather", "edit", make_tool("v3")) == 3
+
+    reloaded = ToolHistory(path)
+    reloaded.load()
+    assert [entry["version"] for entry in reloaded.get_versions("weather")] == [1, 2, 3]
+    assert reloaded.latest["weather"] == make_tool("v3")
+    assert reloaded.get_version("weather", 2) == make_tool("v2")
+
+
+def test_versions_are_looked_up_by_number(tmp_path):
+    path = str(tmp_path / "tools_config.history")
+    history = ToolHistory(path)
+    history.load()
+    history.record("weather", "create", make_tool("v1"))
+    history.record("weather", "edit", make_tool("v2"))
+    history.record("weather", "edit", make_tool("v3"))
+    with open(path) as f:
+        lines = f.readlines()
+    # Version 2 lost, so the versions no longer match the positions of the entries
+    with open(path, "w") as f:
+        f.writelines([lines[0], lines[2]])
+
+    history = ToolHistory(path)
+    history.load()
+    assert history.get_version("weather", 1) == make_tool("v1")
+    assert history.get_version("weather", 3) == make_tool("v3")
+    with pytest.raises(ValueError):
+        history.get_version("weather", 2)
+
+
+def test_diff_that_does_not_apply_falls_back_to_the_checkpoint(tmp_path):
+    path = str(tmp_path / "tools_config.history")
+    history = ToolHistory(path)
+    history.load()
+    history.record("weather", "create", make_tool("v1"))
+    with open(path, "a") as f:
+        f.write(json.dumps({"tool": "weather", "version": 2, "op": "edit", "diff": [["del", ["missing", "key"]]]}) + "\n")
+
+    history = ToolHistory(path)
+    history.load()
+    assert history.latest["weather"] == make_tool("v1")
+    # The next version is stored in full so it doesn't depend on the broken one
+    history.record("weather", "edit", make_tool("v3"))
+    assert "checkpoint" in history.entries["weather"][-1]
+    assert history.get_version("weather", 3) == make_tool("v3")
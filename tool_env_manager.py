@@ -1,18 +1,46 @@
 import os
+import threading
+import time
 from typing import Dict, Any, List
 from dotenv import load_dotenv
+from config import load_env
 
 class ToolEnvManager:
-    def __init__(self):
+    def __init__(self, keys_file: str = 'tool_keys.env'):
+        self.keys_file = keys_file
+        # Seconds between checks of the keys file's mtime
+        self.check_interval = float(os.getenv("TOOL_KEYS_CHECK_INTERVAL", "1"))
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
         # Load both .env and tool_keys.env
-        load_dotenv()
-        load_dotenv('tool_keys.env')
+        load_env()
+        self.tool_keys = {}
+        self._reload(os.stat(self.keys_file).st_mtime_ns)
+
+    def _reload(self, mtime: int):
+        load_dotenv(self.keys_file)
         self.tool_keys = self._load_tool_keys()
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+
+    def _refresh(self):
+        """Reload tool_keys.env if its mtime changed since the last load"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.keys_file).st_mtime_ns
+            except FileNotFoundError:
+                return
+            if mtime != self._mtime:
+                self._reload(mtime)
 
     def _load_tool_keys(self) -> Dict[str, str]:
         """Load tool keys from tool_keys.env"""
         tool_keys = {}
-        with open('tool_keys.env', 'r') as f:
+        with open(self.keys_file, 'r') as f:
             for line in f:
                 line = line.strip()
                 if line and not line.startswith('#'):
@@ -20,8 +48,14 @@ class ToolEnvManager:
                     tool_keys[key.strip()] = value.strip()
         return tool_keys
 
+    def get_version(self) -> int:
+        """Get a value that changes whenever tool_keys.env is reloaded"""
+        self._refresh()
+        return self._mtime
+
     def get_tool_key(self, key: str) -> str:
         """Get the actual environment variable name for a tool key"""
+        self._refresh()
         return self.tool_keys.get(key)
 
     def get_tool_value(self, key: str) -> str:
@@ -33,13 +67,14 @@ class ToolEnvManager:
 
     def get_available_keys(self) -> List[str]:
         """Get list of available tool keys"""
+        self._refresh()
         return list(self.tool_keys.keys())
 
     def get_all_tool_values(self) -> Dict[str, str]:
         """Get all tool keys and their corresponding environment variable values"""
         return {
             key: self.get_tool_value(key)
-            for key in self.tool_keys.keys()
+            for key in self.get_available_keys()
         }
 
     def is_key_available(self, key: str) -> bool:
@@ -49,7 +84,19 @@ class ToolEnvManager:
     def get_tool_config(self, tool_name: str) -> Dict[str, Any]:
         """Get configuration for a specific tool based on its name"""
         config = {}
-        for key, value in self.tool_keys.items():
+        for key in self.get_available_keys():
             if key.startswith(tool_name.upper()):
                 config[key] = self.get_tool_value(key)
-        return config 
\ No newline at end of file
+        return config
+
+_shared_manager = None
+_shared_lock = threading.Lock()
+
+def get_env_manager() -> ToolEnvManager:
+    """Get the process-wide ToolEnvManager, created on first use"""
+    global _shared_manager
+    if _shared_manager is None:
+        with _shared_lock:
+            if _shared_manager is None:
+                _shared_manager = ToolEnvManager()
+    return _shared_manager
@@ -0,0 +1,155 @@
+import ast
+import inspect
+import math
+import operator
+from typing import Any, Callable, Dict, Tuple
+
+# "io" executors run on the agent's thread pool, "cpu" ones on its process pool
+COST_CLASSES = ("io", "cpu")
+
+_TYPE_CHECKS = {
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list)
+}
+
+
+class ToolArgumentError(ValueError):
+    """Raised when the arguments of a tool call don't match the tool's schema"""
+
+
+def compile_schema(parameters: Dict[str, Any]) -> Tuple[Callable[[Dict[str, Any]], Dict[str, Any]], Dict[str, str]]:
+    """Compile a tool's JSON schema into an argument validator
+
+    Returns the validator and the env_var parameters with the tool key each
+    one is read from. Those are never taken from the model: the validator
+    drops them and ToolExecutor fills them in at call time.
+    """
+    properties = parameters.get("properties", {})
+    env_params = {
+        name: prop.get("env_var_name")
+        for name, prop in properties.items()
+        if prop.get("type") == "env_var"
+    }
+    required = tuple(name for name in parameters.get("required", []) if name not in env_params)
+    checks = tuple(
+        (name, prop["type"], _TYPE_CHECKS[prop["type"]])
+        for name, prop in properties.items()
+        if prop.get("type") in _TYPE_CHECKS
+    )
+
+    def validate(arguments: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError("arguments must be a JSON object")
+        missing = [name for name in required if name not in arguments]
+        if missing:
+            raise ToolArgumentError(f"missing required arguments: {', '.join(missing)}")
+        for name, type_name, check in checks:
+            if name in arguments and not check(arguments[name]):
+                raise ToolArgumentError(f"argument '{name}' must be of type {type_name}")
+        return {name: value for name, value in arguments.items() if name not in env_params}
+
+    return validate, env_params
+
+
+class ToolExecutor:
+    """A tool bound to its implementation, with the argument schema compiled once
+
+    fn is None for tools that have no implementation yet. cost_class
+    overrides the tool's declared one.
+    """
+
+    def __init__(self, tool, fn: Callable[..., Any] = None, env_manager=None, cost_class: str = None):
+        self.tool = tool
+        self.fn = fn
+        self.is_async = fn is not None and inspect.iscoroutinefunction(fn)
+        self.cost_class = cost_class or tool.cost_class
+        self.env_manager = env_manager
+        self.validate, self.env_params = compile_schema(tool.parameters)
+
+    def bind_env(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """Add the current value of every env_var parameter to validated arguments"""
+        if not self.env_params:
+            return arguments
+        return {
+            **arguments,
+            **{name: self.env_manager.get_tool_value(key) for name, key in self.env_params.items()}
+        }
+
+
+def search_web(query: str, api_key: str = None) -> str:
+    return f"Searching web for: {query}"
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+_MATH_NAMES = {name: getattr(math, name) for name in dir(math) if not name.startswith("_")}
+_MAX_EXPONENT = 10000
+# Integers are kept to about the 4300 digits Python will still convert to text, so
+# no step of an expression can spend long on huge numbers
+_MAX_INT_BITS = 14000
+# math functions whose result grows with their integer arguments, and the largest argument allowed
+_GROWING_FUNCTIONS = {"factorial": 1000, "comb": 5000, "perm": 1000}
+
+
+def _bits(value: Any) -> int:
+    return abs(value).bit_length() if isinstance(value, int) else 0
+
+
+def _check_size(value: Any) -> Any:
+    if _bits(value) > _MAX_INT_BITS:
+        raise ValueError("result too large")
+    return value
+
+
+def _evaluate(node: ast.AST) -> Any:
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return _check_size(node.value)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _evaluate(node.left), _evaluate(node.right)
+        if isinstance(node.op, ast.Pow):
+            if abs(right) > _MAX_EXPONENT:
+                raise ValueError("exponent too large")
+            # Estimate the size of an integer power before computing it
+            if isinstance(right, int) and right > 0 and _bits(left) * right > _MAX_INT_BITS + right:
+                raise ValueError("result too large")
+        elif isinstance(node.op, ast.Mult) and _bits(left) + _bits(right) > _MAX_INT_BITS + 1:
+            raise ValueError("result too large")
+        return _check_size(_BINARY_OPERATORS[type(node.op)](left, right))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_evaluate(node.operand))
+    if isinstance(node, ast.Name) and node.id in _MATH_NAMES and not callable(_MATH_NAMES[node.id]):
+        return _MATH_NAMES[node.id]
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and callable(_MATH_NAMES.get(node.func.id))
+            and not node.keywords):
+        arguments = [_evaluate(arg) for arg in node.args]
+        limit = _GROWING_FUNCTIONS.get(node.func.id)
+        if limit is not None and any(isinstance(arg, int) and arg > limit for arg in arguments):
+            raise ValueError(f"{node.func.id} arguments must be at most {limit}")
+        return _check_size(_MATH_NAMES[node.func.id](*arguments))
+    raise ValueError(f"unsupported expression: {ast.dump(node)[:40]}")
+
+
+def calculate(expression: str) -> str:
+    """Evaluate an arithmetic expression, allowing the functions and constants of the math module"""
+    return str(_evaluate(ast.parse(expression, mode="eval")))
+
+
+# Implementations of the built-in tools, bound by name when the tools are registered
+BUILTIN_EXECUTORS: Dict[str, Callable[..., Any]] = {
+    "search_web": search_web,
+    "calculate": calculate
+}
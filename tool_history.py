@@ -0,0 +1,243 @@
+import copy
+import difflib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+def diff_values(old: Any, new: Any, path: tuple = ()) -> List[list]:
+    """Get the operations that turn old into new
+
+    Dicts are compared key by key, multi-line strings line by line, and
+    anything else is replaced whole. Operations are ["set", path, value],
+    ["del", path] and ["text", path, [[start, end, lines], ...]].
+    """
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = [["del", [*path, key]] for key in old if key not in new]
+        for key, value in new.items():
+            if key in old:
+                ops.extend(diff_values(old[key], value, (*path, key)))
+            else:
+                ops.append(["set", [*path, key], value])
+        return ops
+    if isinstance(old, str) and isinstance(new, str) and ("\n" in old or "\n" in new):
+        old_lines, new_lines = old.splitlines(keepends=True), new.splitlines(keepends=True)
+        matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+        edits = [
+            [i1, i2, new_lines[j1:j2]]
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+            if tag != "equal"
+        ]
+        return [["text", list(path), edits]]
+    return [["set", list(path), new]]
+
+
+def _apply_text(text: str, edits: List[list]) -> str:
+    lines = text.splitlines(keepends=True)
+    # Edits refer to the original line numbers, so apply them from the end
+    for start, end, new_lines in reversed(edits):
+        lines[start:end] = new_lines
+    return "".join(lines)
+
+
+def apply_diff(value: Any, ops: List[list]) -> Any:
+    """Apply operations from diff_values to value in place and return the result"""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            value = copy.deepcopy(op[2]) if kind == "set" else _apply_text(value, op[2])
+            continue
+        parent = value
+        for key in path[:-1]:
+            parent = parent[key]
+        key = path[-1]
+        if kind == "set":
+            # Copied so later in-place edits of the result never reach the stored diff
+            parent[key] = copy.deepcopy(op[2])
+        elif kind == "del":
+            del parent[key]
+        else:
+            parent[key] = _apply_text(parent[key], op[2])
+    return value
+
+
+class ToolHistory:
+    """Append-only version log of every tool definition
+
+    Each version is stored as a diff against the previous one, with a full
+    checkpoint every `checkpoint_every` versions and after a deletion. The
+    latest definition is kept in memory, and any version is rebuilt from
+    the nearest checkpoint at or before it by replaying fewer than
+    checkpoint_every diffs.
+    """
+
+    def __init__(self, path: str = 'tools_config.history'):
+        self.path = path
+        self.checkpoint_every = int(os.getenv("TOOL_HISTORY_CHECKPOINT_EVERY", "50"))
+        self.entries: Dict[str, List[Dict[str, Any]]] = {}
+        self.latest: Dict[str, Optional[Dict[str, Any]]] = {}
+        # Position of each version in entries, by tool name and version number
+        self._positions: Dict[str, Dict[int, int]] = {}
+        self._since_checkpoint: Dict[str, int] = {}
+        self._batch: List[Dict[str, Any]] = None
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Read the log, dropping unreadable lines such as a torn last one from the file"""
+        with self._lock:
+            self.entries, self.latest, self._positions, self._since_checkpoint = {}, {}, {}, {}
+            try:
+                with open(self.path, 'r') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                return
+            lines = data.splitlines(keepends=True)
+            kept = []
+            for line in lines:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    print(f"Skipping unreadable entry in {self.path}")
+                    continue
+                kept.append(line if line.endswith("\n") else line + "\n")
+                self._apply(entry)
+            # Rewritten so the next append doesn't land on the same line as a torn one
+            if len(kept) != len(lines) or (data and not data.endswith("\n")):
+                self._rewrite("".join(kept))
+
+    def _rewrite(self, data: str):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _apply(self, entry: Dict[str, Any]):
+        name = entry["tool"]
+        entries = self.entries.setdefault(name, [])
+        entries.append(entry)
+        self._positions.setdefault(name, {})[entry["version"]] = len(entries) - 1
+        if entry["op"] == "delete":
+            self.latest[name] = None
+            self._since_checkpoint[name] = 0
+        elif "checkpoint" in entry:
+            self.latest[name] = copy.deepcopy(entry["checkpoint"])
+            self._since_checkpoint[name] = 0
+        else:
+            try:
+                self.latest[name] = apply_diff(self.latest[name], entry["diff"])
+                self._since_checkpoint[name] += 1
+            except Exception as e:
+                # Keep the nearest checkpoint and write a full one with the next version
+                print(f"Error applying version {entry['version']} of tool {name} from {self.path}: {e}")
+                self.latest[name] = self._last_checkpoint(name)
+                self._since_checkpoint[name] = self.checkpoint_every
+
+    def _last_checkpoint(self, name: str) -> Optional[Dict[str, Any]]:
+        for entry in reversed(self.entries[name]):
+            if entry["op"] == "delete":
+                return None
+            if "checkpoint" in entry:
+                return copy.deepcopy(entry["checkpoint"])
+        return None
+
+    def record(self, name: str, op: str, definition: Dict[str, Any] = None, checkpoint: bool = False, **details):
+        """Add a version: op is "create", "edit", "rollback" or "delete" (without a definition)
+
+        With checkpoint the full definition is stored even if a diff would do.
+        """
+        with self._lock:
+            entry = {"tool": name, "version": self.get_latest_version(name) + 1, "op": op,
+                     "at": datetime.now().isoformat(), **details}
+            previous = self.latest.get(name)
+            if definition is not None:
+                definition = copy.deepcopy(definition)
+                if checkpoint or previous is None or self._since_checkpoint[name] + 1 >= self.checkpoint_every:
+                    entry["checkpoint"] = definition
+                else:
+                    entry["diff"] = diff_values(previous, definition)
+            self._apply(entry)
+            if self._batch is not None:
+                self._batch.append(entry)
+            else:
+                self._append([entry])
+            return entry["version"]
+
+    @contextmanager
+    def batch(self):
+        """Buffer every version recorded inside the block and write them with a single append"""
+        with self._lock:
+            if self._batch is not None:
+                yield
+                return
+            self._batch = []
+            try:
+                yield
+            finally:
+                entries, self._batch = self._batch, None
+                if entries:
+                    self._append(entries)
+
+    def _append(self, entries: List[Dict[str, Any]]):
+        data = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with open(self.path, 'a') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def get_latest_version(self, name: str) -> int:
+        """Get the number of the newest version of a tool, 0 if it has none"""
+        entries = self.entries.get(name)
+        return entries[-1]["version"] if entries else 0
+
+    def get_version(self, name: str, version: int) -> Optional[Dict[str, Any]]:
+        """Rebuild a past definition of a tool, None if that version is a deletion"""
+        with self._lock:
+            entries = self.entries.get(name, [])
+            position = self._positions.get(name, {}).get(version)
+            if position is None:
+                raise ValueError(f"Tool '{name}' has no version {version}")
+            start = position
+            while start >= 0 and entries[start]["op"] != "delete" and "checkpoint" not in entries[start]:
+                start -= 1
+            if start < 0:
+                raise ValueError(f"Version {version} of tool '{name}' has no checkpoint to rebuild it from")
+            if entries[start]["op"] == "delete":
+                return None
+            definition = copy.deepcopy(entries[start]["checkpoint"])
+            try:
+                for entry in entries[start + 1:position + 1]:
+                    definition = apply_diff(definition, entry["diff"])
+            except Exception as e:
+                raise ValueError(f"Version {version} of tool '{name}' can't be rebuilt: {e}")
+            return definition
+
+    def get_versions(self, name: str, limit: int = None) -> List[Dict[str, Any]]:
+        """Summarize the newest `limit` versions of a tool (all if None), oldest first"""
+        with self._lock:
+            entries = self.entries.get(name, [])
+            if limit:
+                entries = entries[-limit:]
+            summaries = []
+            for entry in entries:
+                if "diff" in entry:
+                    changed = sorted({op[1][0] for op in entry["diff"] if op[1]} - {"last_modified"})
+                else:
+                    changed = None
+                summary = {key: entry[key] for key in ("version", "op", "at") if key in entry}
+                if changed is not None:
+                    summary["changed"] = changed
+                if "from_version" in entry:
+                    summary["from_version"] = entry["from_version"]
+                summaries.append(summary)
+            return summaries
+
+    def compare(self, name: str, from_version: int, to_version: int) -> List[list]:
+        """Get the diff between two versions of a tool"""
+        return diff_values(self.get_version(name, from_version) or {}, self.get_version(name, to_version) or {})
@@ -0,0 +1,76 @@
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Iterable
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens, breaking snake_case names apart"""
+    return _TOKEN_RE.findall(text.lower())
+
+class ToolIndex:
+    """BM25 index over tool text, updated incrementally as tools change"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._documents: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, name: str, text: str):
+        """Index a document, replacing any previous version with the same name"""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(name)
+            self._documents[name] = terms
+            self._lengths[name] = sum(terms.values())
+            self._total_length += self._lengths[name]
+            for term, frequency in terms.items():
+                self._postings.setdefault(term, {})[name] = frequency
+
+    def remove(self, name: str):
+        """Drop a document from the index"""
+        with self._lock:
+            self._remove(name)
+
+    def _remove(self, name: str):
+        terms = self._documents.pop(name, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(name)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[name]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, top_k: int, exclude: Iterable[str] = ()) -> List[str]:
+        """Get the names of the top_k documents scoring highest for query"""
+        ranked = sorted(self.score(query, exclude).items(), key=lambda item: item[1], reverse=True)
+        return [name for name, _ in ranked[:top_k]]
+
+    def score(self, query: str, exclude: Iterable[str] = ()) -> Dict[str, float]:
+        """Get the BM25 score for query of every document sharing a term with it"""
+        exclude = set(exclude)
+        with self._lock:
+            count = len(self._documents)
+            if not count:
+                return {}
+            average_length = self._total_length / count
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for name, frequency in postings.items():
+                    if name in exclude:
+                        continue
+                    norm = frequency + self.k1 * (1 - self.b + self.b * self._lengths[name] / average_length)
+                    scores[name] = scores.get(name, 0.0) + idf * frequency * (self.k1 + 1) / norm
+        return scores
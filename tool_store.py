@@ -0,0 +1,116 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, List
+
+class ToolStore:
+    """Persists tool definitions as a JSON snapshot plus an append-only journal
+
+    Every change appends one line to the journal instead of rewriting the
+    snapshot. Once the journal holds `compact_every` entries it is folded
+    into a new snapshot, written atomically with os.replace.
+    """
+
+    def __init__(self, snapshot_path: str = 'tools_config.json', journal_path: str = 'tools_config.journal'):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = int(os.getenv("TOOL_JOURNAL_COMPACT_EVERY", "200"))
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self._journal_entries = 0
+        self._batch: List[Dict[str, Any]] = None
+        self._lock = threading.RLock()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Load the snapshot and replay the journal over it"""
+        with self._lock:
+            self.tools = {}
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    for tool_data in json.load(f):
+                        self.tools[tool_data['name']] = tool_data
+            except FileNotFoundError:
+                pass
+
+            self._journal_entries = 0
+            torn = False
+            try:
+                with open(self.journal_path, 'r') as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # A torn last line from a crash mid-append
+                            print(f"Skipping unreadable entry in {self.journal_path}")
+                            torn = True
+                            continue
+                        self._apply(entry)
+                        self._journal_entries += 1
+            except FileNotFoundError:
+                pass
+
+            # Compacting also clears a torn line before anything is appended after it
+            if torn or self._journal_entries >= self.compact_every:
+                self.compact()
+            return dict(self.tools)
+
+    def _apply(self, entry: Dict[str, Any]):
+        if entry["op"] == "put":
+            self.tools[entry["tool"]["name"]] = entry["tool"]
+        elif entry["op"] == "delete":
+            self.tools.pop(entry["name"], None)
+
+    def put(self, tool_data: Dict[str, Any]):
+        """Persist a created or edited tool"""
+        self._write({"op": "put", "tool": tool_data})
+
+    def delete(self, name: str):
+        """Persist the deletion of a tool"""
+        self._write({"op": "delete", "name": name})
+
+    def _write(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._apply(entry)
+            if self._batch is not None:
+                self._batch.append(entry)
+            else:
+                self._append([entry])
+
+    @contextmanager
+    def batch(self):
+        """Buffer every change made inside the block and write them with a single append"""
+        with self._lock:
+            if self._batch is not None:
+                yield
+                return
+            self._batch = []
+            try:
+                yield
+            finally:
+                entries, self._batch = self._batch, None
+                if entries:
+                    self._append(entries)
+
+    def _append(self, entries: List[Dict[str, Any]]):
+        data = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with open(self.journal_path, 'a') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_entries += len(entries)
+        if self._journal_entries >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Fold the journal into a new snapshot and truncate it"""
+        with self._lock:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(list(self.tools.values()), f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # Only drop the journal once the snapshot covering it is in place
+            with open(self.journal_path, 'w'):
+                pass
+            self._journal_entries = 0
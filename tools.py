@@ -1,16 +1,42 @@
-from typing import Dict, Any, List
-import json
+from typing import Dict, Any, List, Callable, Optional, Tuple
+from contextlib import contextmanager
 from datetime import datetime
-from tool_env_manager import ToolEnvManager
+import json
+import os
+import threading
+import time
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows, where the registry is only shared within one process
+    fcntl = None
+from tool_env_manager import get_env_manager
+from tool_store import ToolStore
+from tool_history import ToolHistory
+from tool_index import ToolIndex
+from tool_executors import BUILTIN_EXECUTORS, COST_CLASSES, ToolExecutor
+from sandbox import SandboxPool, validate_tool_code
+
+# Built-in tools the agent uses to manage the registry, always offered to the model
+MANAGEMENT_TOOL_NAMES = ("create_tool", "edit_tool", "delete_tool", "get_tool_history", "rollback_tool")
 
 class Tool:
-    def __init__(self, name: str, description: str, parameters: Dict[str, Any], created_at: str = None, last_modified: str = None):
+    def __init__(self, name: str, description: str, parameters: Dict[str, Any], created_at: str = None, last_modified: str = None,
+                 cache_ttl: float = None, cost_class: str = "io", code: str = None):
+        if cost_class not in COST_CLASSES:
+            raise ValueError(f"cost_class must be one of {', '.join(COST_CLASSES)}")
         self.name = name
         self.description = description
         self.parameters = parameters
+        # Seconds a result can be reused for identical arguments, None for tools whose results change
+        self.cache_ttl = cache_ttl
+        # Whether the implementation runs on the thread pool ("io") or the process pool ("cpu")
+        self.cost_class = cost_class
+        # Python source defining run(**arguments), for tools written by the agent
+        self.code = code
         self.created_at = created_at or datetime.now().isoformat()
         self.last_modified = last_modified or datetime.now().isoformat()
-        self.env_manager = ToolEnvManager()
+        self.env_manager = get_env_manager()
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -18,15 +44,55 @@ class Tool:
             "description": self.description,
             "parameters": self.parameters,
             "created_at": self.created_at,
-            "last_modified": self.last_modified
+            "last_modified": self.last_modified,
+            "cache_ttl": self.cache_ttl,
+            "cost_class": self.cost_class,
+            "code": self.code
+        }
+
+    def to_api_schema(self) -> Dict[str, Any]:
+        """Get the tool in the function-calling format expected by the Groq API
+
+        env_var parameters are left out: their values come from
+        tool_keys.env, never from the model.
+        """
+        properties = self.parameters.get("properties", {})
+        env_params = {name for name, prop in properties.items() if prop.get("type") == "env_var"}
+        parameters = self.parameters
+        if env_params:
+            parameters = {
+                **self.parameters,
+                "properties": {name: prop for name, prop in properties.items() if name not in env_params}
+            }
+            if "required" in self.parameters:
+                parameters["required"] = [name for name in self.parameters["required"] if name not in env_params]
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": parameters
+            }
         }
 
-    def update(self, description: str = None, parameters: Dict[str, Any] = None):
+    def get_index_text(self) -> str:
+        """Get the text the relevance index matches queries against"""
+        parts = [self.name, self.description]
+        for param_name, param in self.parameters.get("properties", {}).items():
+            parts.append(param_name)
+            parts.append(param.get("description", ""))
+        return " ".join(parts)
+
+    def update(self, description: str = None, parameters: Dict[str, Any] = None, cache_ttl: float = None, code: str = None):
         """Update tool properties"""
         if description:
             self.description = description
         if parameters:
             self.parameters = parameters
+        if cache_ttl is not None:
+            self.cache_ttl = cache_ttl or None
+        if code is not None:
+            self.code = code or None
         self.last_modified = datetime.now().isoformat()
 
     def get_required_env_vars(self) -> List[str]:
@@ -48,13 +114,182 @@ class Tool:
 class ToolRegistry:
     def __init__(self):
         self.tools: Dict[str, Tool] = {}
-        self.env_manager = ToolEnvManager()
-        self._register_default_tools()
+        self.env_manager = get_env_manager()
+        self.store = ToolStore()
+        self.history = ToolHistory()
+        # Bumped on every create/edit/delete so callers can cache derived data
+        self.version = 0
+        self._api_tools = None
+        self.index = ToolIndex()
+        # Implementations by tool name, and each tool bound to its implementation
+        self.implementations: Dict[str, Callable[..., Any]] = {
+            **BUILTIN_EXECUTORS,
+            "create_tool": self._create_tool_command,
+            "edit_tool": self._edit_tool_command,
+            "delete_tool": self._delete_tool_command,
+            "get_tool_history": self._get_tool_history_command,
+            "rollback_tool": self._rollback_tool_command
+        }
+        self.executors: Dict[str, ToolExecutor] = {}
+        # Runs the code of agent-written tools, its workers start once such a tool exists
+        self.sandbox = SandboxPool()
+        # Worker processes share the tool files: changes hold an exclusive lock on
+        # tools_config.json.lock and every registry reloads the files once another one wrote them
+        self.lock_path = f"{self.store.snapshot_path}.lock"
+        self.reload_interval = float(os.getenv("TOOL_RELOAD_INTERVAL", "1"))
+        # Held by every change and every read, management commands change tools from the tool thread pool
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        self._files_signature = None
+        self._next_reload_check = 0.0
+        with self._locked(), self.store.batch(), self.history.batch():
+            self._load_tools_from_file()
+            self._register_default_tools()
+
+    def _files_state(self) -> Tuple[Optional[Tuple[int, int]], ...]:
+        """Get the modification time and size of each tool file"""
+        state = []
+        for path in (self.store.snapshot_path, self.store.journal_path, self.history.path):
+            try:
+                stat = os.stat(path)
+                state.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the registry for a change, across threads and processes
+
+        The tool files are reloaded first if another process changed them,
+        so the change is made on top of the latest definitions.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                self._lock_file = open(self.lock_path, 'a')
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1 and self._files_signature is not None \
+                        and self._files_state() != self._files_signature:
+                    self._reload()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    self._files_signature = self._files_state()
+                    # Closing the file releases the flock
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _refresh(self):
+        """Pick up changes other processes made to the tool files, checking at most every reload_interval seconds"""
+        now = time.monotonic()
+        if now < self._next_reload_check:
+            return
+        self._next_reload_check = now + self.reload_interval
+        if self._files_state() != self._files_signature:
+            with self._locked():
+                pass
+
+    def _reload(self):
+        """Rebuild every tool from the files after another process changed them"""
+        for name in self.tools:
+            self.index.remove(name)
+        self.tools = {}
+        self.executors = {}
         self._load_tools_from_file()
 
+    def _register_default_tool(self, tool: Tool):
+        """Register a default tool unless a stored version of it was loaded"""
+        if tool.name not in self.tools:
+            self.register_tool(tool)
+
     def _register_default_tools(self):
+        # Tool management commands handled by the agent itself
+        name_param = {"type": "string", "description": "The name of the tool"}
+        code_param = {
+            "type": "string",
+            "description": "Python source defining run(**arguments), called with the tool parameters; its return value is the result"
+        }
+        cache_ttl_param = {
+            "type": "number",
+            "description": "Seconds a result can be reused for the same arguments, omit if results change between calls"
+        }
+        self._register_default_tool(
+            Tool(
+                name="create_tool",
+                description="Create a new tool",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "name": name_param,
+                        "description": {"type": "string", "description": "What the tool does"},
+                        "parameters": {"type": "object", "description": "JSON schema of the tool parameters"},
+                        "cache_ttl": cache_ttl_param,
+                        "code": code_param
+                    },
+                    "required": ["name", "description", "parameters"]
+                }
+            )
+        )
+        self._register_default_tool(
+            Tool(
+                name="edit_tool",
+                description="Edit the description or parameters of an existing tool",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "name": name_param,
+                        "description": {"type": "string", "description": "The new description"},
+                        "parameters": {"type": "object", "description": "The new JSON schema of the tool parameters"},
+                        "cache_ttl": {**cache_ttl_param, "description": "New result reuse time in seconds, 0 disables it"},
+                        "code": {**code_param, "description": "New Python source defining run(**arguments)"}
+                    },
+                    "required": ["name"]
+                }
+            )
+        )
+        self._register_default_tool(
+            Tool(
+                name="delete_tool",
+                description="Delete a tool",
+                parameters={"type": "object", "properties": {"name": name_param}, "required": ["name"]}
+            )
+        )
+        self._register_default_tool(
+            Tool(
+                name="get_tool_history",
+                description="Get the version history of a tool, or one past version in full",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "name": name_param,
+                        "version": {"type": "integer", "description": "Version to return in full, omit for the list of versions"}
+                    },
+                    "required": ["name"]
+                }
+            )
+        )
+        self._register_default_tool(
+            Tool(
+                name="rollback_tool",
+                description="Restore a tool to a previous version from its history",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "name": name_param,
+                        "version": {"type": "integer", "description": "The version to restore"}
+                    },
+                    "required": ["name", "version"]
+                }
+            )
+        )
+
         # Example tool for searching the web
-        self.register_tool(
+        self._register_default_tool(
             Tool(
                 name="search_web",
                 description="Search the web for information",
@@ -72,12 +307,32 @@ class ToolRegistry:
                         }
                     },
                     "required": ["query", "api_key"]
-                }
+                },
+                cache_ttl=3600
+            )
+        )
+
+        self._register_default_tool(
+            Tool(
+                name="calculate",
+                description="Evaluate an arithmetic expression, math module functions such as sqrt and log are allowed",
+                parameters={
+                    "type": "object",
+                    "properties": {
+                        "expression": {
+                            "type": "string",
+                            "description": "The expression to evaluate, e.g. (2 + 3) * sqrt(16)"
+                        }
+                    },
+                    "required": ["expression"]
+                },
+                cache_ttl=86400,
+                cost_class="cpu"
             )
         )
 
         # Example tool for weather
-        self.register_tool(
+        self._register_default_tool(
             Tool(
                 name="weather",
                 description="Get weather information for a location",
@@ -95,40 +350,48 @@ class ToolRegistry:
                         }
                     },
                     "required": ["location", "api_key"]
-                }
+                },
+                cache_ttl=600
             )
         )
 
     def _load_tools_from_file(self):
-        """Load tools from a JSON file"""
-        try:
-            with open('tools_config.json', 'r') as f:
-                tools_data = json.load(f)
-                for tool_data in tools_data:
-                    tool = Tool(
-                        name=tool_data['name'],
-                        description=tool_data['description'],
-                        parameters=tool_data['parameters'],
-                        created_at=tool_data.get('created_at'),
-                        last_modified=tool_data.get('last_modified')
-                    )
-                    self.tools[tool.name] = tool
-        except FileNotFoundError:
-            # If file doesn't exist, create it with default tools
-            self._save_tools_to_file()
-
-    def _save_tools_to_file(self):
-        """Save tools to a JSON file"""
-        tools_data = [tool.to_dict() for tool in self.tools.values()]
-        with open('tools_config.json', 'w') as f:
-            json.dump(tools_data, f, indent=2)
+        """Load tools from the snapshot file and its journal, and their version history"""
+        self.history.load()
+        for tool_data in self.store.load().values():
+            tool = Tool(
+                name=tool_data['name'],
+                description=tool_data['description'],
+                parameters=tool_data['parameters'],
+                created_at=tool_data.get('created_at'),
+                last_modified=tool_data.get('last_modified'),
+                cache_ttl=tool_data.get('cache_ttl'),
+                cost_class=tool_data.get('cost_class', 'io'),
+                code=tool_data.get('code')
+            )
+            self.tools[tool.name] = tool
+            self._bind_executor(tool)
+            self.index.add(tool.name, tool.get_index_text())
+            latest = self.history.latest.get(tool.name)
+            if latest is None:
+                # Tools stored before the history existed start it at their current definition
+                self.history.record(tool.name, "create", tool.to_dict(), at=tool.last_modified)
+            elif latest != tool.to_dict():
+                # A history that lost versions is brought back in line with the stored tool
+                self.history.record(tool.name, "edit", tool.to_dict(), checkpoint=True, at=tool.last_modified)
+        self.version += 1
 
     def register_tool(self, tool: Tool):
         """Register a new tool"""
-        if tool.name in self.tools:
-            raise ValueError(f"Tool with name '{tool.name}' already exists")
-        
-        # Check if required environment variables are available
+        with self._locked():
+            if tool.name in self.tools:
+                raise ValueError(f"Tool with name '{tool.name}' already exists")
+
+            self._check_env_vars(tool)
+            self._install(tool, "create")
+
+    def _check_env_vars(self, tool: Tool):
+        """Raise if an environment variable the tool requires isn't available"""
         env_check = tool.check_env_vars()
         missing_vars = [var for var, available in env_check.items() if not available]
         
@@ -136,78 +399,245 @@ class ToolRegistry:
             raise ValueError(
                 f"Missing required environment variables for tool '{tool.name}': {', '.join(missing_vars)}"
             )
-        
+
+    def _install(self, tool: Tool, op: str, **details):
+        """Make tool the current definition of its name, persist it and add a version to its history"""
         self.tools[tool.name] = tool
-        self._save_tools_to_file()
+        self._bind_executor(tool)
+        self.store.put(tool.to_dict())
+        self.history.record(tool.name, op, tool.to_dict(), **details)
+        self.index.add(tool.name, tool.get_index_text())
+        self.version += 1
+
+    def _bind_executor(self, tool: Tool):
+        """Bind a tool to its implementation and compile its argument schema
+
+        Tools without a bound implementation but with code run in the sandbox.
+        """
+        fn = self.implementations.get(tool.name)
+        if fn is None and tool.code:
+            code = tool.code
 
-    def create_tool(self, name: str, description: str, parameters: Dict[str, Any]) -> Tool:
+            def run_code(**arguments):
+                return self.sandbox.run(code, arguments)
+
+            # The sandbox call only waits on a worker process, so it runs on the thread pool
+            self.executors[tool.name] = ToolExecutor(tool, run_code, self.env_manager, cost_class="io")
+            # Start the workers now so their interpreter startup is over by the first call
+            self.sandbox.start()
+            return
+        self.executors[tool.name] = ToolExecutor(tool, fn, self.env_manager)
+
+    def bind_implementation(self, name: str, fn: Callable[..., Any]):
+        """Set the callable, sync or async, that executes the tool called name
+
+        Implementations of "cpu" tools run in another process and must be
+        module-level functions.
+        """
+        with self._lock:
+            self.implementations[name] = fn
+            if name in self.tools:
+                self._bind_executor(self.tools[name])
+
+    def get_executor(self, name: str) -> ToolExecutor:
+        """Get the executor bound to a tool, None if there is no such tool"""
+        self._refresh()
+        with self._lock:
+            return self.executors.get(name)
+
+    def register_tools(self, tools: List[Tool]):
+        """Register several tools, persisting them with a single write"""
+        with self._locked(), self.store.batch():
+            for tool in tools:
+                self.register_tool(tool)
+
+    def create_tool(self, name: str, description: str, parameters: Dict[str, Any], cache_ttl: float = None,
+                    code: str = None) -> Tool:
         """Create and register a new tool"""
-        tool = Tool(name=name, description=description, parameters=parameters)
+        if code:
+            validate_tool_code(code)
+        tool = Tool(name=name, description=description, parameters=parameters, cache_ttl=cache_ttl or None, code=code or None)
         self.register_tool(tool)
         return tool
 
-    def edit_tool(self, name: str, description: str = None, parameters: Dict[str, Any] = None) -> Tool:
+    def edit_tool(self, name: str, description: str = None, parameters: Dict[str, Any] = None, cache_ttl: float = None,
+                  code: str = None) -> Tool:
         """Edit an existing tool"""
-        if name not in self.tools:
-            raise ValueError(f"Tool with name '{name}' not found")
-        
-        tool = self.tools[name]
-        original_tool = Tool(
-            name=tool.name,
-            description=tool.description,
-            parameters=tool.parameters,
-            created_at=tool.created_at,
-            last_modified=tool.last_modified
-        )
-        
-        # If parameters are being updated, check environment variables
-        if parameters:
-            temp_tool = Tool(name=name, description=description or tool.description, parameters=parameters)
-            env_check = temp_tool.check_env_vars()
-            missing_vars = [var for var, available in env_check.items() if not available]
-            
-            if missing_vars:
-                raise ValueError(
-                    f"Missing required environment variables for tool '{name}': {', '.join(missing_vars)}"
-                )
-        
-        tool.update(description, parameters)
-        self._save_tools_to_file()
-        
-        return {
-            "updated_tool": tool,
-            "original_tool": original_tool,
-            "warning": "Warning: Editing existing tools may affect their functionality. Make sure to test the tool after modification."
-        }
+        with self._locked():
+            if name not in self.tools:
+                raise ValueError(f"Tool with name '{name}' not found")
+            if name in MANAGEMENT_TOOL_NAMES:
+                raise ValueError(f"Tool '{name}' is built in and cannot be edited")
+
+            tool = self.tools[name]
+            original_tool = Tool(
+                name=tool.name,
+                description=tool.description,
+                parameters=tool.parameters,
+                created_at=tool.created_at,
+                last_modified=tool.last_modified,
+                cache_ttl=tool.cache_ttl,
+                cost_class=tool.cost_class,
+                code=tool.code
+            )
+
+            # If parameters are being updated, check environment variables
+            if parameters:
+                self._check_env_vars(Tool(name=name, description=description or tool.description, parameters=parameters))
+
+            if code:
+                validate_tool_code(code)
+            tool.update(description, parameters, cache_ttl, code)
+            self._install(tool, "edit")
+
+            return {
+                "updated_tool": tool,
+                "original_tool": original_tool,
+                "warning": "Warning: Editing existing tools may affect their functionality. Make sure to test the tool after modification."
+            }
 
     def delete_tool(self, name: str):
         """Delete a tool"""
-        if name not in self.tools:
-            raise ValueError(f"Tool with name '{name}' not found")
-        del self.tools[name]
-        self._save_tools_to_file()
+        with self._locked():
+            if name not in self.tools:
+                raise ValueError(f"Tool with name '{name}' not found")
+            if name in MANAGEMENT_TOOL_NAMES:
+                raise ValueError(f"Tool '{name}' is built in and cannot be deleted")
+            del self.tools[name]
+            self.executors.pop(name, None)
+            self.store.delete(name)
+            self.history.record(name, "delete")
+            self.index.remove(name)
+            self.version += 1
 
     def get_tools(self) -> List[Dict[str, Any]]:
         """Get all registered tools in the format expected by Groq"""
-        return [tool.to_dict() for tool in self.tools.values()]
+        self._refresh()
+        with self._lock:
+            return [tool.to_dict() for tool in self.tools.values()]
+
+    def get_api_tools(self, names: List[str] = None) -> List[Dict[str, Any]]:
+        """Get the tool schemas sent to the Groq API, cached until the registry changes
+
+        If names is given only those tools are returned, in that order.
+        """
+        self._refresh()
+        with self._lock:
+            if self._api_tools is None or self._api_tools[0] != self.version:
+                self._api_tools = (self.version, {name: tool.to_api_schema() for name, tool in self.tools.items()})
+            schemas = self._api_tools[1]
+        if names is None:
+            return list(schemas.values())
+        return [schemas[name] for name in names if name in schemas]
+
+    def select_tools(self, query: str, top_k: int) -> List[str]:
+        """Get the names of the management tools plus the top_k tools most relevant to query
+
+        Every tool is returned when top_k is 0 or the registry is small enough.
+        """
+        self._refresh()
+        with self._lock:
+            if top_k <= 0 or len(self.tools) <= top_k + len(MANAGEMENT_TOOL_NAMES):
+                return list(self.tools)
+            management = [name for name in MANAGEMENT_TOOL_NAMES if name in self.tools]
+            return management + self.index.search(query, top_k, exclude=MANAGEMENT_TOOL_NAMES)
+
+    def score_tools(self, query: str) -> Dict[str, float]:
+        """Get the BM25 relevance to query of every tool sharing a word with it"""
+        with self._lock:
+            return self.index.score(query)
 
     def get_tool_by_name(self, name: str) -> Tool:
         """Get a specific tool by name"""
-        return self.tools.get(name)
+        self._refresh()
+        with self._lock:
+            return self.tools.get(name)
 
-    def get_tool_history(self, name: str) -> Dict[str, Any]:
-        """Get the creation and modification history of a tool"""
-        if name not in self.tools:
-            raise ValueError(f"Tool with name '{name}' not found")
-        
-        tool = self.tools[name]
-        return {
-            "name": tool.name,
-            "created_at": tool.created_at,
-            "last_modified": tool.last_modified,
-            "current_version": tool.to_dict()
-        }
+    def get_tool_history(self, name: str, limit: int = 20) -> Dict[str, Any]:
+        """Get the creation and modification history of a tool and its newest `limit` versions"""
+        self._refresh()
+        with self._lock:
+            if name not in self.tools:
+                raise ValueError(f"Tool with name '{name}' not found")
+
+            tool = self.tools[name]
+            return {
+                "name": tool.name,
+                "created_at": tool.created_at,
+                "last_modified": tool.last_modified,
+                "current_version": tool.to_dict(),
+                "version": self.history.get_latest_version(name),
+                "versions": self.history.get_versions(name, limit)
+            }
+
+    def rollback_tool(self, name: str, version: int) -> Tool:
+        """Restore a tool, even a deleted one, to a version from its history
+
+        The restored definition becomes a new version, so a rollback can be
+        rolled back as well.
+        """
+        with self._locked():
+            if name in MANAGEMENT_TOOL_NAMES:
+                raise ValueError(f"Tool '{name}' is built in and cannot be rolled back")
+            definition = self.history.get_version(name, version)
+            if definition is None:
+                raise ValueError(f"Version {version} of tool '{name}' is a deletion")
+            tool = Tool(
+                name=name,
+                description=definition["description"],
+                parameters=definition["parameters"],
+                created_at=definition.get("created_at"),
+                cache_ttl=definition.get("cache_ttl"),
+                cost_class=definition.get("cost_class", "io"),
+                code=definition.get("code")
+            )
+            self._check_env_vars(tool)
+            self._install(tool, "rollback", from_version=version)
+            return tool
 
     def get_available_env_vars(self) -> Dict[str, str]:
         """Get all available environment variables for tools"""
-        return self.env_manager.get_all_tool_values() 
\ No newline at end of file
+        return self.env_manager.get_all_tool_values()
+
+    def _create_tool_command(self, name: str, description: str, parameters: Dict[str, Any], cache_ttl: float = None,
+                             code: str = None) -> str:
+        try:
+            new_tool = self.create_tool(
+                name=name, description=description, parameters=parameters, cache_ttl=cache_ttl, code=code
+            )
+            return f"Successfully created tool: {new_tool.to_dict()}"
+        except Exception as e:
+            return f"Error creating tool: {str(e)}"
+
+    def _edit_tool_command(self, name: str, description: str = None, parameters: Dict[str, Any] = None,
+                           cache_ttl: float = None, code: str = None) -> str:
+        try:
+            result = self.edit_tool(
+                name=name, description=description, parameters=parameters, cache_ttl=cache_ttl, code=code
+            )
+            return f"Tool edited successfully. {result['warning']}\nOriginal: {result['original_tool'].to_dict()}\nUpdated: {result['updated_tool'].to_dict()}"
+        except Exception as e:
+            return f"Error editing tool: {str(e)}"
+
+    def _delete_tool_command(self, name: str) -> str:
+        try:
+            self.delete_tool(name)
+            return f"Successfully deleted tool: {name}"
+        except Exception as e:
+            return f"Error deleting tool: {str(e)}"
+
+    def _get_tool_history_command(self, name: str, version: int = None) -> str:
+        try:
+            if version is not None:
+                return f"Tool {name} version {version}: {json.dumps(self.history.get_version(name, version), indent=2)}"
+            history = self.get_tool_history(name)
+            return f"Tool history: {json.dumps(history, indent=2)}"
+        except Exception as e:
+            return f"Error getting tool history: {str(e)}"
+
+    def _rollback_tool_command(self, name: str, version: int) -> str:
+        try:
+            tool = self.rollback_tool(name, version)
+            return f"Tool {name} rolled back to version {version}: {tool.to_dict()}"
+        except Exception as e:
+            return f"Error rolling back tool: {str(e)}"
@@ -0,0 +1,31 @@
+import argparse
+from memory_manager import MemoryManager
+
+def main():
+    """Export users' memories to a JSONL file or import them from one, resuming if interrupted"""
+    parser = argparse.ArgumentParser(description="Export or import user memories as JSONL")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path")
+    parser.add_argument("--users", nargs="+", help="only export these users")
+    parser.add_argument("--checkpoint", help="checkpoint file, defaults to <path>.checkpoint")
+    args = parser.parse_args()
+    checkpoint_path = args.checkpoint or f"{args.path}.checkpoint"
+
+    def progress(done, total):
+        print(f"{done}/{total} users" if total else f"{done} lines", flush=True)
+
+    try:
+        manager = MemoryManager()
+        if args.command == "export":
+            count = manager.export_jsonl(args.path, args.users, checkpoint_path, progress)
+            print(f"Exported {count} users to {args.path}")
+        else:
+            count = manager.import_jsonl(args.path, checkpoint_path, progress)
+            print(f"Imported {count} lines from {args.path}")
+        manager.close()
+    except Exception as e:
+        print(f"Error during memory {args.command}: {e}")
+        print(f"Run the same command again to resume from {checkpoint_path}")
+
+if __name__ == "__main__":
+    main()
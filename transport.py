@@ -0,0 +1,222 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional
+
+import httpx
+from groq import AsyncGroq, APIConnectionError
+from metrics import metrics
+
+if TYPE_CHECKING:
+    from zep_python import ZepClient
+
+# Responses worth retrying: rate limiting and server-side failures
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit breaker is open"""
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Get the HTTP status code carried by a client exception, if any"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether an error is transient: a timeout, a connection failure, a 429 or a 5xx"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, httpx.TransportError, APIConnectionError)):
+        return True
+    return get_status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def get_retry_after(error: Exception) -> float:
+    """Get the delay requested by a Retry-After header, 0 if there is none"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return max(float(headers.get("retry-after", 0)), 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CircuitBreaker:
+    """Fails calls fast after repeated failures, then lets a trial call through
+
+    The breaker opens after failure_threshold consecutive failed calls. Once
+    reset_timeout seconds have passed it becomes half-open and allows one
+    trial call: success closes it again, failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_timeout: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+        self.state = "closed"
+        self.failures = 0
+        self._changed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            self.state = state
+            self._changed_at = time.monotonic()
+            metrics.set_gauge("circuit_state", CIRCUIT_STATES[state], service=self.name)
+            if state == "open":
+                metrics.increment("circuit_opened_total", service=self.name)
+
+    def allow(self) -> bool:
+        """Check whether a call may go out now"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self._changed_at < self.reset_timeout:
+                return False
+            # One trial call, or a new one if the last trial never reported back
+            self._changed_at = time.monotonic()
+            self._set_state("half_open")
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._set_state("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self._changed_at = time.monotonic()
+                self._set_state("open")
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the circuit breaker shared by every caller of a service in this process"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+
+class ServiceGuard:
+    """Calls a service with a deadline, retries with jittered backoff and a circuit breaker
+
+    Transient errors are retried with exponential backoff and full jitter
+    (honouring Retry-After) until max_attempts is reached or the next
+    attempt would start after the deadline. Any other error means the
+    service answered, so it is raised right away and counts as a success
+    for the breaker.
+    """
+
+    def __init__(self, name: str, deadline: float, breaker: CircuitBreaker = None):
+        self.name = name
+        self.deadline = deadline
+        self.breaker = breaker or get_breaker(name)
+        self.max_attempts = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+        self.base_delay = float(os.getenv("RETRY_BASE_DELAY", "0.2"))
+        self.max_delay = float(os.getenv("RETRY_MAX_DELAY", "2"))
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            metrics.increment("circuit_rejected_total", service=self.name)
+            raise CircuitOpenError(f"{self.name} is unavailable, circuit breaker is open")
+
+    def _next_delay(self, error: Exception, attempt: int, deadline: float) -> Optional[float]:
+        """Record a failed attempt and get the delay before the next one, None to give up"""
+        if not is_retryable(error):
+            self.breaker.record_success()
+            return None
+        metrics.increment("transport_errors_total", service=self.name)
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        delay = max(backoff, get_retry_after(error))
+        if attempt >= self.max_attempts or time.monotonic() + delay >= deadline:
+            # Only calls that exhaust their retries count against the breaker
+            self.breaker.record_failure()
+            return None
+        metrics.increment("transport_retries_total", service=self.name)
+        return delay
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call a blocking function, each attempt being bounded by the client's own timeout"""
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self._check_breaker()
+            attempt += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def acall(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await a coroutine function, cancelling any attempt still running at the deadline"""
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            self._check_breaker()
+            attempt += 1
+            try:
+                result = await asyncio.wait_for(fn(*args, **kwargs), timeout=max(deadline - time.monotonic(), 0))
+            except Exception as e:
+                delay = self._next_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+
+def get_http_limits() -> httpx.Limits:
+    """Connection pool limits shared by the HTTP clients"""
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("HTTP_KEEPALIVE_CONNECTIONS", "20")),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    )
+
+
+def create_groq_client() -> AsyncGroq:
+    """Create an AsyncGroq client on a keep-alive connection pool
+
+    The SDK's own retries are disabled, ServiceGuard owns the retry policy.
+    """
+    timeout = float(os.getenv("GROQ_TIMEOUT", "30"))
+    return AsyncGroq(
+        api_key=os.getenv("GROQ_API_KEY"),
+        max_retries=0,
+        timeout=timeout,
+        http_client=httpx.AsyncClient(limits=get_http_limits(), timeout=timeout)
+    )
+
+
+def create_zep_client() -> "ZepClient":
+    """Create a ZepClient whose requests time out after ZEP_TIMEOUT seconds"""
+    # Imported here so processes that never talk to Zep don't pay for the import
+    from zep_python import ZepClient
+    client = ZepClient(
+        base_url=os.getenv("ZEP_API_URL", "https://api.zep.cloud"),
+        api_key=os.getenv("ZEP_API_KEY")
+    )
+    # zep-python builds its own pooled httpx clients, only their timeout is adjusted
+    timeout = httpx.Timeout(float(os.getenv("ZEP_TIMEOUT", "3")))
+    for http_client in (getattr(client, "client", None), getattr(client, "aclient", None)):
+        if isinstance(http_client, (httpx.Client, httpx.AsyncClient)):
+            http_client.timeout = timeout
+    return client
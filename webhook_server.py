@@ -0,0 +1,177 @@
+import asyncio
+import hmac
+import json
+import logging
+import zlib
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Telegram updates are small, anything bigger is not from Telegram
+MAX_BODY_SIZE = 1024 * 1024
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"
+}
+
+class PayloadTooLarge(ValueError):
+    """The request body is bigger than MAX_BODY_SIZE"""
+
+async def read_http_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """Read one HTTP/1.1 request, returning (method, path, headers, body) or None on EOF
+
+    Raises PayloadTooLarge for a body over MAX_BODY_SIZE and ValueError
+    for any other malformed request.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", "0"))
+    if length < 0:
+        raise ValueError(f"invalid Content-Length {length}")
+    if length > MAX_BODY_SIZE:
+        raise PayloadTooLarge(f"request body of {length} bytes is too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+async def write_http_response(writer: asyncio.StreamWriter, status: int, body: bytes = b"",
+                              content_type: str = "application/json"):
+    """Write one HTTP/1.1 response"""
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    )
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+def get_chat_id(update_data: Dict[str, Any]) -> Any:
+    """Get the chat an update belongs to, falling back to its update_id"""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if key in update_data:
+            return update_data[key].get("chat", {}).get("id")
+    if "callback_query" in update_data:
+        return update_data["callback_query"].get("message", {}).get("chat", {}).get("id")
+    return update_data.get("update_id")
+
+def chat_shard(chat_id: Any, shards: int) -> int:
+    """Map a chat to a shard, stable across processes unlike hash()"""
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+class ChatRouter:
+    """Runs updates through a fixed number of lanes
+
+    Every chat is hashed to one lane and each lane handles its updates one
+    at a time, so a chat's updates are processed in the order received
+    while different chats run concurrently.
+    """
+
+    def __init__(self, handler: Callable[[Dict[str, Any]], Awaitable[None]], lanes: int, max_queue: int = 0):
+        self.handler = handler
+        self.lanes = lanes
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self.max_queue = max_queue
+
+    def start(self):
+        self._queues = [asyncio.Queue(maxsize=self.max_queue) for _ in range(self.lanes)]
+        self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    async def submit(self, update_data: Dict[str, Any]):
+        """Queue an update on its chat's lane, waiting if that lane is full"""
+        await self._queues[chat_shard(get_chat_id(update_data), self.lanes)].put(update_data)
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            update_data = await queue.get()
+            try:
+                await self.handler(update_data)
+            except Exception as e:
+                logger.error(f"Error handling update {update_data.get('update_id')}: {e}")
+            finally:
+                queue.task_done()
+
+    def queue_depths(self) -> List[int]:
+        """Get the number of updates waiting on each lane"""
+        return [queue.qsize() for queue in self._queues]
+
+    async def drain(self):
+        """Wait for every queued update to be handled, then stop the lanes"""
+        for queue in self._queues:
+            await queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+class WebhookServer:
+    """Minimal HTTP server receiving Telegram webhook updates
+
+    Updates are acknowledged as soon as they are queued so Telegram doesn't
+    retry them while the agent is still working.
+    """
+
+    def __init__(self, router: ChatRouter, host: str, port: int, path: str, secret_token: str = None):
+        self.router = router
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self._server: asyncio.AbstractServer = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        """Stop accepting updates and finish the ones already queued"""
+        self._server.close()
+        await self._server.wait_closed()
+        await self.router.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await read_http_request(reader)
+                except PayloadTooLarge:
+                    await write_http_response(writer, 413)
+                    break
+                except ValueError:
+                    await write_http_response(writer, 400)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                await write_http_response(writer, await self._handle_request(method, path, headers, body))
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> int:
+        if path != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        if self.secret_token and not hmac.compare_digest(
+            headers.get("x-telegram-bot-api-secret-token", ""), self.secret_token
+        ):
+            return 403
+        try:
+            update_data = json.loads(body)
+        except ValueError:
+            return 400
+        await self.router.submit(update_data)
+        return 200
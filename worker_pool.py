@@ -0,0 +1,138 @@
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import signal
+from typing import Any, Dict, List
+from metrics import metrics
+from webhook_server import ChatRouter, chat_shard, get_chat_id
+
+logger = logging.getLogger(__name__)
+
+def get_user_id(update_data: Dict[str, Any]) -> Any:
+    """Get the user who sent an update, falling back to its chat"""
+    for key in ("message", "edited_message", "callback_query"):
+        sender = update_data.get(key, {}).get("from")
+        if sender:
+            return sender.get("id")
+    return get_chat_id(update_data)
+
+class ShardedWorkerPool:
+    """Fans Telegram updates out to worker processes, one shard per process
+
+    Updates are routed by user id, so every user is handled by the same
+    worker, which owns its own GroqAgent, memory cache and history. Within
+    a worker, each chat's updates run in order. Workers share the tool
+    files, which the ToolRegistry locks across processes. A worker found
+    dead is restarted and picks up the updates still in its queue.
+    """
+
+    def __init__(self, processes: int):
+        self.processes = processes
+        self.drain_timeout = float(os.getenv("WORKER_DRAIN_TIMEOUT", "30"))
+        # Spawned, not forked, so workers don't inherit the front end's threads and event loop
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = []
+        self._processed = []
+        self._workers = []
+        self._dispatched: List[int] = [0] * processes
+        self._stopped = False
+
+    def start(self):
+        """Start every worker process"""
+        for shard in range(self.processes):
+            self._queues.append(self._context.Queue())
+            self._processed.append(self._context.Value("l", 0))
+            self._workers.append(self._start_worker(shard))
+        # Workers aren't daemons, so they must be stopped even if the front end exits on an error
+        atexit.register(self.stop)
+
+    def _start_worker(self, shard: int):
+        worker = self._context.Process(
+            target=_worker_main,
+            args=(shard, self._queues[shard], self._processed[shard]),
+            name=f"agent-shard-{shard}",
+            # Not a daemon, daemonic processes can't start the process pool "cpu" tools run on
+            daemon=False
+        )
+        worker.start()
+        return worker
+
+    def submit(self, update_data: Dict[str, Any]) -> int:
+        """Send an update to its user's shard and return the shard number"""
+        shard = chat_shard(get_user_id(update_data), self.processes)
+        if not self._workers[shard].is_alive():
+            logger.error(f"Shard {shard} exited with code {self._workers[shard].exitcode}, restarting it")
+            metrics.increment("worker_restarts_total", shard=shard)
+            self._workers[shard] = self._start_worker(shard)
+        self._queues[shard].put(update_data)
+        self._dispatched[shard] += 1
+        metrics.set_gauge("worker_queue_depth", self._dispatched[shard] - self._processed[shard].value, shard=shard)
+        return shard
+
+    def queue_depths(self) -> List[int]:
+        """Get the number of updates sent to each shard and not handled yet"""
+        depths = [dispatched - processed.value for dispatched, processed in zip(self._dispatched, self._processed)]
+        for shard, depth in enumerate(depths):
+            metrics.set_gauge("worker_queue_depth", depth, shard=shard)
+        return depths
+
+    def stop(self):
+        """Let every worker finish its queued updates, then wait for it to exit"""
+        if self._stopped:
+            return
+        self._stopped = True
+        for queue in self._queues:
+            queue.put(None)
+        for shard, worker in enumerate(self._workers):
+            worker.join(self.drain_timeout)
+            if worker.is_alive():
+                logger.error(f"Shard {shard} did not drain within {self.drain_timeout}s, terminating it")
+                worker.terminate()
+                worker.join()
+
+def _worker_main(shard: int, queue, processed):
+    """Entry point of a worker process"""
+    # The front end coordinates shutdown, Ctrl+C must not kill workers mid-update
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ["WORKER_PROCESSES"] = "0"
+    logging.basicConfig(
+        format=f'%(asctime)s - shard {shard} - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    from telegram_bot import TelegramBot
+    bot = TelegramBot()
+    bot.start_metrics_server(offset=shard + 1)
+    asyncio.run(_serve_shard(bot, queue, processed))
+
+async def _serve_shard(bot, queue, processed):
+    """Process updates from the front end until it sends None"""
+    from telegram import Update
+
+    application = bot.build_application()
+
+    async def process(update_data):
+        try:
+            await application.process_update(Update.de_json(update_data, application.bot))
+        finally:
+            with processed.get_lock():
+                processed.value += 1
+
+    router = ChatRouter(process, lanes=bot.webhook_lanes)
+    await application.initialize()
+    await application.start()
+    router.start()
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            update_data = await loop.run_in_executor(None, queue.get)
+            if update_data is None:
+                break
+            await router.submit(update_data)
+    finally:
+        await router.drain()
+        await bot.drain_chats(application)
+        await application.stop()
+        await application.shutdown()
+        await bot.shutdown(application)